@@ -6,4 +6,5 @@ Central hub for all AI components:
 - training: fine-tuning pipeline
 - evaluation: metrics computation and logging
 - inference: deployment and runtime prediction
+- scoring: readiness, risk labels and ranked gaps (config/scoring.yml)
 """
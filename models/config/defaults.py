@@ -1,10 +1,12 @@
 """
 Global defaults for models: device, hyperparameters, paths, and label maps.
 All modules import from here to stay consistent.
+Importing this module is cheap: DEVICE (needs torch) and the label maps (read from
+artifacts) are resolved on first access through the module __getattr__.
 """
 from pathlib import Path
-import torch
 import json
+import os
 
 # Root repo directory
 ROOT_DIR = Path(__file__).resolve().parents[2]
@@ -15,21 +17,12 @@ ARTIFACTS_DIR = DATA_DIR / "artifacts"
 MODEL_OUT_DIR = ROOT_DIR / "models" / "artifacts"
 LOG_DIR = ROOT_DIR / "models" / "logs"
 REPORTS_DIR = ROOT_DIR / "reports"
+TOKENIZED_DIR = DATA_DIR / "tokenized"  # cached tokenized splits, keyed by fingerprint
 
 # MODEL_OUT_DIR.mkdir(parents=True, exist_ok=True)
 # LOG_DIR.mkdir(parents=True, exist_ok=True)
 # REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
-# Labels (doc_type, risk) – loaded from artifacts
-with open(ARTIFACTS_DIR / "id2label.json", "r", encoding="utf-8") as f:
-    LABEL_MAP = json.load(f)
-
-DOC_TYPE_LABELS = LABEL_MAP["doc_type"]
-RISK_LABELS = LABEL_MAP["risk"]
-
-NUM_DOC_TYPE_LABELS = len(DOC_TYPE_LABELS)
-NUM_RISK_LABELS = len(RISK_LABELS)
-
 # Backbone defaults
 DOC_TYPE_BACKBONE = "distilroberta-base"
 RISK_BACKBONE = "distilroberta-base"
@@ -39,11 +32,84 @@ RETRIEVER_BACKBONE = "intfloat/e5-base"  # strong baseline for retrieval
 MAX_LENGTH = 512
 TRAIN_BATCH_SIZE = 16
 EVAL_BATCH_SIZE = 32
+TOKENIZE_NUM_PROC = max(1, (os.cpu_count() or 1) // 2)
+# Token-budget batching: same worst-case padded size as a full fixed batch
+MAX_TOKENS_PER_BATCH = TRAIN_BATCH_SIZE * MAX_LENGTH
+
+# Long-document classification: strided 512-token windows, pooled per document
+LONG_DOC_STRIDE = 128          # tokens shared by consecutive windows
+LONG_DOC_MAX_WINDOWS = 8       # cap per document → bounded latency
+LONG_DOC_POOLING = "mean"      # "mean" | "max" | "attention"
+
+# Classifier inference backend: "auto" (int8 ONNX on CPU when exported) | "onnx" | "torch"
+CLASSIFIER_BACKEND = os.environ.get("AIX_CLF_BACKEND", "auto")
+ONNX_OPSET = 17
+
+# Retriever: per-namespace indices cached in RAM (LRU, evicted past this budget)
+SEARCHER_CACHE_MB = int(os.environ.get("AIX_SEARCHER_CACHE_MB", "1024"))
+
+# Retrieval mode: "dense" (FAISS only) | "hybrid" (dense + BM25, reciprocal rank fusion)
+#                 | "multi" (one vector per query chunk, per-article aggregation)
+RETRIEVAL_MODE = os.environ.get("AIX_RETRIEVAL_MODE", "dense")
+HYBRID_CANDIDATES = 50  # rows taken from each ranking before fusion
+
+# Multi-vector querying (mode "multi"): long query documents searched chunk by chunk
+QUERY_MAX_CHUNKS = 16          # evenly spread over the document → bounded cost
+QUERY_AGGREGATION = "max"      # "max" (max-sim) | "topm" (sum of the top_m chunk scores)
+QUERY_TOP_M = 3
+
+# Retriever embedding cache (keyed by model fingerprint + normalized text hash)
+EMBED_CACHE = os.environ.get("AIX_EMBED_CACHE", "1") == "1"
+EMBED_CACHE_DIR = ROOT_DIR / "models" / "cache" / "embeddings"
+EMBED_CACHE_MAX_ROWS = int(os.environ.get("AIX_EMBED_CACHE_ROWS", "200000"))
+EMBED_CACHE_DTYPE = "float16"  # halves disk/page-cache use; cosine error ~1e-3
+# query documents are one-off texts: by default they are encoded without touching the
+# cache so they do not evict article embeddings (AIX_EMBED_CACHE_QUERIES=1 caches them too)
+EMBED_CACHE_QUERIES = os.environ.get("AIX_EMBED_CACHE_QUERIES", "0") == "1"
+
+# Compiled rule-pack / YAML cache (see models/retriever/rulepack.py)
+RULEPACK_CACHE_DIR = ROOT_DIR / "models" / "cache" / "rulepacks"
+
+# Scoring (readiness, risk label, ranked gaps; see models/scoring/engine.py)
+SCORING_CONFIG = Path(os.environ.get("AIX_SCORING_CONFIG", str(ROOT_DIR / "config" / "scoring.yml")))
+SCORING_CALIBRATION = MODEL_OUT_DIR / "scoring_calibration.json"  # empirical max gap + risk quantile cuts
+
+# Chunking (retriever tokenizer tokens; leaves room for special tokens + e5 prefix)
+CHUNK_MAX_TOKENS = 256
+CHUNK_OVERLAP = 32
+CHUNKS_DIR = ROOT_DIR / "data" / "processed" / "chunks"
 
 # Optim
 LEARNING_RATE = 5e-5
 EPOCHS = 3
 WEIGHT_DECAY = 0.01
 
-# Device – default GPU if present
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# Lazily resolved (see __getattr__):
+#   DEVICE – AIX_DEVICE if set, else GPU if present (imports torch)
+#   LABEL_MAP, DOC_TYPE_LABELS, RISK_LABELS, NUM_DOC_TYPE_LABELS, NUM_RISK_LABELS – from artifacts/id2label.json
+_LABEL_NAMES = ("LABEL_MAP", "DOC_TYPE_LABELS", "RISK_LABELS", "NUM_DOC_TYPE_LABELS", "NUM_RISK_LABELS")
+
+def _load_labels():
+    with open(ARTIFACTS_DIR / "id2label.json", "r", encoding="utf-8") as f:
+        label_map = json.load(f)
+    return {
+        "LABEL_MAP": label_map,
+        "DOC_TYPE_LABELS": label_map["doc_type"],
+        "RISK_LABELS": label_map["risk"],
+        "NUM_DOC_TYPE_LABELS": len(label_map["doc_type"]),
+        "NUM_RISK_LABELS": len(label_map["risk"]),
+    }
+
+def _detect_device() -> str:
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+def __getattr__(name):
+    # computed once, then cached as a module global (later lookups never get here)
+    if name == "DEVICE":
+        globals()["DEVICE"] = os.environ.get("AIX_DEVICE") or _detect_device()
+        return globals()["DEVICE"]
+    if name in _LABEL_NAMES:
+        globals().update(_load_labels())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,7 +2,8 @@
 Metrics helpers for multi-class classification:
 - compute_doc_type_metrics
 - compute_risk_metrics
-Both return dicts compatible with HF Trainer.
+- compute_multitask_metrics (shared-backbone model: both heads at once)
+All return dicts compatible with HF Trainer.
 """
 import numpy as np
 from sklearn.metrics import f1_score, accuracy_score, precision_recall_fscore_support
@@ -22,3 +23,13 @@ def compute_risk_metrics(eval_pred):
     logits, labels = eval_pred
     preds = np.argmax(logits, axis=-1)
     return _common(preds, labels)
+
+def compute_multitask_metrics(eval_pred):
+    """Per-head metrics (prefixed) plus `f1` = mean of both macro-F1s for model selection."""
+    (dt_logits, risk_logits), (dt_labels, risk_labels) = eval_pred
+    dt = _common(np.argmax(dt_logits, axis=-1), dt_labels)
+    risk = _common(np.argmax(risk_logits, axis=-1), risk_labels)
+    out = {f"doc_type_{k}": v for k, v in dt.items()}
+    out.update({f"risk_{k}": v for k, v in risk.items()})
+    out["f1"] = (dt["f1"] + risk["f1"]) / 2
+    return out
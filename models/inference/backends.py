@@ -0,0 +1,81 @@
+"""
+Pluggable classifier backends for CPU/GPU inference.
+- TorchBackend: the fine-tuned PyTorch model (sequence classifier or multi-task)
+- OnnxBackend: ONNX Runtime session over the int8-quantized export
+  (see models/inference/export_onnx.py)
+Both take int64 numpy `input_ids` / `attention_mask` and return
+{output_name: float32 logits}, so prediction code does not care which one runs.
+"""
+from pathlib import Path
+from typing import Dict, Optional
+import os
+import numpy as np
+import torch
+from models.config.defaults import MODEL_OUT_DIR, DEVICE, CLASSIFIER_BACKEND
+
+ONNX_SUBDIR = "onnx"
+ONNX_FP32 = "model.onnx"
+ONNX_INT8 = "model.int8.onnx"
+
+def onnx_path(name: str, quantized: bool = True) -> Path:
+    return MODEL_OUT_DIR / name / ONNX_SUBDIR / (ONNX_INT8 if quantized else ONNX_FP32)
+
+def onnxruntime_available() -> bool:
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class TorchBackend:
+    kind = "torch"
+
+    def __init__(self, mdl):
+        self.mdl = mdl
+
+    @torch.no_grad()
+    def __call__(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> Dict[str, np.ndarray]:
+        out = self.mdl(
+            input_ids=torch.from_numpy(input_ids).to(DEVICE),
+            attention_mask=torch.from_numpy(attention_mask).to(DEVICE),
+        )
+        out = {"logits": out.logits} if hasattr(out, "logits") else out
+        return {k: v.float().cpu().numpy() for k, v in out.items()}
+
+class OnnxBackend:
+    kind = "onnx"
+
+    def __init__(self, path: Path, intra_op_threads: Optional[int] = None):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            opts.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.output_names = [o.name for o in self.session.get_outputs()]
+
+    def __call__(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> Dict[str, np.ndarray]:
+        outs = self.session.run(self.output_names, {
+            "input_ids": input_ids.astype(np.int64),
+            "attention_mask": attention_mask.astype(np.int64),
+        })
+        return dict(zip(self.output_names, outs))
+
+def resolve_backend(name: str, backend: str = CLASSIFIER_BACKEND) -> str:
+    """
+    "auto" → ONNX when an int8 export exists, onnxruntime is installed and we are on CPU;
+    otherwise PyTorch. "onnx" / "torch" force a backend.
+    """
+    if backend == "auto":
+        use_onnx = DEVICE == "cpu" and onnx_path(name).exists() and onnxruntime_available()
+        return "onnx" if use_onnx else "torch"
+    if backend not in ("onnx", "torch"):
+        raise ValueError(f"Unknown classifier backend: {backend}")
+    return backend
+
+def load_onnx_backend(name: str, quantized: bool = True) -> OnnxBackend:
+    path = onnx_path(name, quantized)
+    if not path.exists():
+        raise FileNotFoundError(f"ONNX export not found: {path} (run models.inference.export_onnx)")
+    threads = int(os.environ.get("AIX_ORT_THREADS", "0")) or None
+    return OnnxBackend(path, intra_op_threads=threads)
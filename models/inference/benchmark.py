@@ -0,0 +1,73 @@
+"""
+Latency / memory benchmark of the classifier backends (PyTorch vs int8 ONNX Runtime).
+Each backend runs in its own spawned process so peak RSS is not shared between them.
+Reports load time, peak RSS, and p50/p99 latency per batch; writes
+REPORTS_DIR/inference_benchmark.json.
+
+Usage:
+  python -m models.inference.benchmark --name doc_type_clf --batch-size 1 --batch-size 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import time
+from typing import Dict, List
+import numpy as np
+from models.config.defaults import REPORTS_DIR
+
+BACKENDS = ("torch", "onnx")
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def _run(name: str, backend: str, texts: List[str], batch_sizes: List[int], iters: int, warmup: int) -> Dict:
+    from models.inference.predict import _load_clf, _forward_logits
+    base_rss = _peak_rss_mb()
+    t0 = time.perf_counter()
+    tok, run = _load_clf(name, backend)
+    out = {"backend": backend, "load_s": time.perf_counter() - t0, "load_rss_mb": _peak_rss_mb() - base_rss}
+    for bs in batch_sizes:
+        batch = (texts * bs)[:bs]
+        for _ in range(warmup):
+            _forward_logits(batch, tok, run)
+        lat = []
+        for _ in range(iters):
+            t = time.perf_counter()
+            _forward_logits(batch, tok, run)
+            lat.append((time.perf_counter() - t) * 1000)
+        out[f"bs{bs}"] = {"p50_ms": float(np.percentile(lat, 50)), "p99_ms": float(np.percentile(lat, 99)),
+                          "docs_per_s": bs * 1000 / float(np.mean(lat))}
+    out["peak_rss_mb"] = _peak_rss_mb()
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--name", default="doc_type_clf")
+    ap.add_argument("--backend", action="append", choices=BACKENDS)
+    ap.add_argument("--batch-size", type=int, action="append")
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--warmup", type=int, default=5)
+    args = ap.parse_args()
+
+    from models.inference.export_onnx import sample_texts
+    texts = sample_texts(32)
+    batch_sizes = args.batch_size or [1, 8]
+    ctx = mp.get_context("spawn")
+    results = []
+    for backend in args.backend or BACKENDS:
+        with ctx.Pool(1) as pool:
+            r = pool.apply(_run, (args.name, backend, texts, batch_sizes, args.iters, args.warmup))
+        results.append(r)
+        print(f"[bench] {args.name}/{backend}: load {r['load_s']:.2f}s, peak RSS {r['peak_rss_mb']:.0f} MB")
+        for bs in batch_sizes:
+            s = r[f"bs{bs}"]
+            print(f"[bench]   bs={bs}: p50 {s['p50_ms']:.1f} ms  p99 {s['p99_ms']:.1f} ms  {s['docs_per_s']:.1f} docs/s")
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = REPORTS_DIR / "inference_benchmark.json"
+    out.write_text(json.dumps({"name": args.name, "results": results}, indent=2), encoding="utf-8")
+    print(f"[bench] wrote {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Export trained classifiers to ONNX with dynamic int8 quantization for CPU serving.
+- doc_type_clf / risk_clf (HF sequence classifiers) → output "logits"
+- multitask_clf → outputs "doc_type_logits", "risk_logits"
+Writes MODEL_OUT_DIR/<name>/onnx/{model.onnx, model.int8.onnx, parity.json}.
+The parity check runs the same validation texts through PyTorch and the
+quantized session and reports max |Δlogit| and argmax agreement per head.
+
+Usage:
+  python -m models.inference.export_onnx                       # doc_type_clf + risk_clf
+  python -m models.inference.export_onnx --name multitask_clf
+"""
+import argparse
+import inspect
+import json
+from typing import Dict, List
+import numpy as np
+import torch
+from torch import nn
+from transformers import AutoTokenizer
+from models.config.defaults import MODEL_OUT_DIR, ONNX_OPSET
+from models.preprocessing.datasets import load_splits
+from models.inference.backends import TorchBackend, OnnxBackend, onnx_path
+from models.inference.predict import MULTITASK_NAME, _load_torch_clf, _load_torch_multitask
+
+DEFAULT_NAMES = ["doc_type_clf", "risk_clf"]
+MULTITASK_OUTPUTS = ["doc_type_logits", "risk_logits"]
+MIN_AGREEMENT = 0.98  # argmax agreement below this flags the int8 model
+
+class _ExportWrapper(nn.Module):
+    """Positional (input_ids, attention_mask) → tuple of logits, as torch.onnx.export expects."""
+    def __init__(self, mdl, output_names: List[str]):
+        super().__init__()
+        self.mdl = mdl
+        self.output_names = output_names
+
+    def forward(self, input_ids, attention_mask):
+        out = self.mdl(input_ids=input_ids, attention_mask=attention_mask)
+        if hasattr(out, "logits"):
+            return out.logits
+        return tuple(out[n] for n in self.output_names)
+
+def sample_texts(n: int = 64) -> List[str]:
+    """Validation texts for parity/benchmarks; falls back to synthetic text when splits are absent."""
+    dd = load_splits()
+    split = dd.get("validation") or dd.get("test")
+    if split is not None and "text" in split.column_names:
+        texts = [t for t in split.select(range(min(n, len(split))))["text"] if t]
+        if texts:
+            return texts
+    base = "The company shall maintain adequate capital and report material incidents to the regulator. "
+    return [base * (1 + i % 20) for i in range(n)]
+
+def export(name: str, sample: List[str]) -> Dict[str, float]:
+    model_dir = MODEL_OUT_DIR / name
+    out_dir = model_dir / "onnx"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    fp32, int8 = onnx_path(name, quantized=False), onnx_path(name, quantized=True)
+
+    tok = AutoTokenizer.from_pretrained(str(model_dir))
+    mdl = (_load_torch_multitask(name) if name == MULTITASK_NAME else _load_torch_clf(name)).cpu()
+    output_names = MULTITASK_OUTPUTS if name == MULTITASK_NAME else ["logits"]
+
+    dummy = tok(sample[:2], truncation=True, max_length=512, padding=True, return_tensors="pt")
+    dynamic = {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}}
+    dynamic.update({o: {0: "batch"} for o in output_names})
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False  # TorchScript exporter: stable dynamic_axes support
+    with torch.no_grad():
+        torch.onnx.export(
+            _ExportWrapper(mdl, output_names),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(fp32),
+            input_names=["input_ids", "attention_mask"],
+            output_names=output_names,
+            dynamic_axes=dynamic,
+            opset_version=ONNX_OPSET,
+            **kwargs,
+        )
+    print(f"[onnx] {name}: exported {fp32}")
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(str(fp32), str(int8), weight_type=QuantType.QInt8)
+    print(f"[onnx] {name}: quantized {int8} ({fp32.stat().st_size / 2**20:.1f} MB → {int8.stat().st_size / 2**20:.1f} MB)")
+
+    report = parity(tok, TorchBackend(mdl), OnnxBackend(int8), sample)
+    (out_dir / "parity.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for head, r in report.items():
+        flag = "" if r["argmax_agreement"] >= MIN_AGREEMENT else "  <-- below threshold"
+        print(f"[onnx] {name}/{head}: max|Δ|={r['max_abs_diff']:.4f} agreement={r['argmax_agreement']:.3f}{flag}")
+    return report
+
+def parity(tok, ref, cand, texts: List[str], batch_size: int = 16) -> Dict[str, Dict[str, float]]:
+    """Compare two backends on the same padded batches."""
+    diffs: Dict[str, List[float]] = {}
+    agree: Dict[str, List[bool]] = {}
+    for i in range(0, len(texts), batch_size):
+        enc = tok(texts[i:i + batch_size], truncation=True, max_length=512, padding=True, return_tensors="np")
+        a = ref(enc["input_ids"], enc["attention_mask"])
+        b = cand(enc["input_ids"], enc["attention_mask"])
+        for head in a:
+            diffs.setdefault(head, []).append(float(np.abs(a[head] - b[head]).max()))
+            agree.setdefault(head, []).extend(a[head].argmax(-1) == b[head].argmax(-1))
+    return {
+        head: {"max_abs_diff": max(diffs[head]), "argmax_agreement": float(np.mean(agree[head])), "n": len(agree[head])}
+        for head in diffs
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--name", action="append", help="model dir under MODEL_OUT_DIR (repeatable)")
+    ap.add_argument("--n-samples", type=int, default=64, help="validation texts used for the parity check")
+    args = ap.parse_args()
+
+    sample = sample_texts(args.n_samples)
+    for name in args.name or DEFAULT_NAMES:
+        export(name, sample)
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,203 @@
 """
 End-to-end inference utilities:
 - load classifiers and retriever
-- classify doc_type and risk
+- classify doc_type and risk (one forward pass when the multi-task model is available)
+- classifier backend picked at load time: int8 ONNX Runtime on CPU, else PyTorch
+- optional long-document mode: strided 512-token windows, batched, logits pooled per doc
 - retrieve top-k regulatory articles for explanations/gaps
+- score readiness, final risk label and ranked gaps (config/scoring.yml, vectorized per batch)
 - return a unified result dict ready for the web UI
+Every stage has a batch form (run_batch) so concurrent requests can share forward passes.
 """
-from typing import Dict, Any, List
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
-from models.config.defaults import MODEL_OUT_DIR, DOC_TYPE_LABELS, RISK_LABELS, DEVICE
-from models.retriever.search import RegulatorSearcher
-import torch
-
-def _load_clf(name: str):
-    path = MODEL_OUT_DIR / name
-    tok = AutoTokenizer.from_pretrained(str(path))
-    mdl = AutoModelForSequenceClassification.from_pretrained(str(path)).to(DEVICE)
+from models.config.defaults import (
+    MODEL_OUT_DIR, DOC_TYPE_LABELS, RISK_LABELS, DEVICE, EVAL_BATCH_SIZE,
+    LONG_DOC_STRIDE, LONG_DOC_MAX_WINDOWS, LONG_DOC_POOLING, CLASSIFIER_BACKEND,
+)
+from models.retriever.registry import SearcherRegistry
+from models.scoring.engine import load_scoring_engine
+from models.multitask_clf.model import MultiTaskClassifier
+from models.inference.backends import TorchBackend, resolve_backend, load_onnx_backend
+
+MULTITASK_NAME = "multitask_clf"
+
+def _load_torch_clf(name: str):
+    mdl = AutoModelForSequenceClassification.from_pretrained(str(MODEL_OUT_DIR / name)).to(DEVICE)
+    mdl.eval()
+    return mdl
+
+def _load_torch_multitask(name: str = MULTITASK_NAME):
+    mdl = MultiTaskClassifier.from_pretrained(str(MODEL_OUT_DIR / name), map_location=DEVICE).to(DEVICE)
     mdl.eval()
-    return tok, mdl
-
-@torch.no_grad()
-def _predict_cls(text: str, tok, mdl, labels: List[str]):
-    enc = tok(text, truncation=True, max_length=512, return_tensors="pt").to(DEVICE)
-    out = mdl(**enc).logits
-    probs = out.softmax(-1)[0].detach().cpu().tolist()
-    idx = int(out.argmax(-1).item())
+    return mdl
+
+def _load_clf(name: str, backend: str = CLASSIFIER_BACKEND):
+    """Tokenizer + a backend callable (input_ids, attention_mask) -> {head: logits}."""
+    tok = AutoTokenizer.from_pretrained(str(MODEL_OUT_DIR / name))
+    if resolve_backend(name, backend) == "onnx":
+        return tok, load_onnx_backend(name)
+    loader = _load_torch_multitask if name == MULTITASK_NAME else _load_torch_clf
+    return tok, TorchBackend(loader(name))
+
+def _load_multitask(name: str = MULTITASK_NAME, backend: str = CLASSIFIER_BACKEND):
+    return _load_clf(name, backend)
+
+@dataclass
+class WindowConfig:
+    """Long-document mode: classify strided windows and pool their logits per document."""
+    stride: int = LONG_DOC_STRIDE
+    max_windows: int = LONG_DOC_MAX_WINDOWS
+    pooling: str = LONG_DOC_POOLING  # "mean" | "max" | "attention"
+
+def _format_pred(logits: np.ndarray, labels: List[str]):
+    """One row of logits → {"label", "probs"} for the web UI."""
+    z = np.exp(logits - logits.max())
+    probs = z / z.sum()
+    idx = int(probs.argmax())
     return {"label": labels[idx], "probs": {labels[i]: float(p) for i, p in enumerate(probs)}}
 
+def _cap_windows(sample_ids: np.ndarray, max_windows: int) -> np.ndarray:
+    """Indices of the windows to keep: at most `max_windows` per document, evenly spread (first and last kept)."""
+    keep = []
+    for doc in np.unique(sample_ids):
+        win = np.flatnonzero(sample_ids == doc)
+        if len(win) > max_windows:
+            win = win[np.unique(np.linspace(0, len(win) - 1, max_windows).round().astype(int))]
+        keep.append(win)
+    return np.concatenate(keep)
+
+def _encode_windows(texts: List[str], tok, windows: Optional[WindowConfig]):
+    """
+    Token windows for every text plus the document each window belongs to.
+    Without a WindowConfig each text is truncated to a single 512-token window.
+    """
+    if windows is None:
+        enc = tok(texts, truncation=True, max_length=512)
+        return enc["input_ids"], enc["attention_mask"], np.arange(len(texts))
+    enc = tok(texts, truncation=True, max_length=512, stride=windows.stride, return_overflowing_tokens=True)
+    sample_ids = np.asarray(enc["overflow_to_sample_mapping"])
+    keep = _cap_windows(sample_ids, windows.max_windows)
+    return [enc["input_ids"][i] for i in keep], [enc["attention_mask"][i] for i in keep], sample_ids[keep]
+
+def _pool_windows(logits: np.ndarray, sample_ids: np.ndarray, n_docs: int, pooling: str) -> np.ndarray:
+    """Combine window logits (W, C) into document logits (n_docs, C) with segment ops, no per-doc loops."""
+    counts = np.bincount(sample_ids, minlength=n_docs).astype(logits.dtype)[:, None]
+    if pooling == "max":
+        out = np.full((n_docs, logits.shape[1]), -np.inf, dtype=logits.dtype)
+        np.maximum.at(out, sample_ids, logits)
+        return out
+    if pooling == "attention":
+        # weight each window by its softmax confidence, normalized within its document
+        z = logits - logits.max(-1, keepdims=True)
+        conf = -np.log(np.exp(z).sum(-1))  # = max log-prob of the window
+        seg_max = np.full(n_docs, -np.inf, dtype=logits.dtype)
+        np.maximum.at(seg_max, sample_ids, conf)
+        w = np.exp(conf - seg_max[sample_ids])
+        denom = np.bincount(sample_ids, weights=w, minlength=n_docs)
+        w = (w / denom[sample_ids])[:, None]
+        out = np.zeros((n_docs, logits.shape[1]), dtype=logits.dtype)
+        np.add.at(out, sample_ids, w * logits)
+        return out
+    if pooling != "mean":
+        raise ValueError(f"Unknown pooling strategy: {pooling}")
+    out = np.zeros((n_docs, logits.shape[1]), dtype=logits.dtype)
+    np.add.at(out, sample_ids, logits)
+    return out / np.maximum(counts, 1)
+
+def _forward_logits(texts: List[str], tok, mdl, windows: Optional[WindowConfig] = None,
+                    batch_size: int = EVAL_BATCH_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Document-level logits per output head: {"logits"} for a sequence classifier,
+    {"doc_type_logits", "risk_logits"} for the multi-task model. All windows of all
+    texts go through the backend as padded sub-batches of `batch_size`.
+    """
+    input_ids, attention_mask, sample_ids = _encode_windows(texts, tok, windows)
+    heads: Dict[str, List[np.ndarray]] = {}
+    for i in range(0, len(input_ids), batch_size):
+        enc = tok.pad({"input_ids": input_ids[i:i + batch_size], "attention_mask": attention_mask[i:i + batch_size]},
+                      return_tensors="np")
+        for name, arr in mdl(enc["input_ids"], enc["attention_mask"]).items():
+            heads.setdefault(name, []).append(arr)
+    logits = {name: np.concatenate(parts) for name, parts in heads.items()}
+    if windows is None:
+        return logits
+    return {name: _pool_windows(l, sample_ids, len(texts), windows.pooling) for name, l in logits.items()}
+
+def _predict_cls_batch(texts: List[str], tok, mdl, labels: List[str],
+                       windows: Optional[WindowConfig] = None) -> List[Dict[str, Any]]:
+    logits = _forward_logits(texts, tok, mdl, windows)["logits"]
+    return [_format_pred(row, labels) for row in logits]
+
+def _predict_multitask_batch(texts: List[str], tok, mdl,
+                             windows: Optional[WindowConfig] = None) -> List[Tuple[Dict, Dict]]:
+    """Both heads from one tokenization and one encoder pass per sub-batch."""
+    logits = _forward_logits(texts, tok, mdl, windows)
+    return [
+        (_format_pred(dt, DOC_TYPE_LABELS), _format_pred(rk, RISK_LABELS))
+        for dt, rk in zip(logits["doc_type_logits"], logits["risk_logits"])
+    ]
+
+def _predict_cls(text: str, tok, mdl, labels: List[str], windows: Optional[WindowConfig] = None):
+    return _predict_cls_batch([text], tok, mdl, labels, windows)[0]
+
+def _predict_multitask(text: str, tok, mdl, windows: Optional[WindowConfig] = None):
+    return _predict_multitask_batch([text], tok, mdl, windows)[0]
+
 class InferencePipeline:
-    def __init__(self, regulator_ns: str):
-        # Load classifiers
-        self.dt_tok, self.dt_mdl = _load_clf("doc_type_clf")
-        self.risk_tok, self.risk_mdl = _load_clf("risk_clf")
-        # Load retriever for selected regulator
-        self.searcher = RegulatorSearcher(regulator_ns)
-
-    def run(self, text: str, k: int = 5) -> Dict[str, Any]:
-        # 1) Document type
-        doc_type = _predict_cls(text, self.dt_tok, self.dt_mdl, DOC_TYPE_LABELS)
-
-        # 2) Retrieve top-k relevant regulatory articles
-        hits = self.searcher.search(text, k=k)
-
-        # 3) Risk prediction (baseline uses raw text; you can concatenate hits texts for stronger signal)
-        risk = _predict_cls(text, self.risk_tok, self.risk_mdl, RISK_LABELS)
-
-        return {
-            "doc_type": doc_type,
-            "risk": risk,
-            "retrieved": hits
-        }
-    
+    def __init__(self, regulator_ns: str, long_doc: bool = False, windows: Optional[WindowConfig] = None,
+                 backend: str = CLASSIFIER_BACKEND):
+        # Long documents: classify capped, strided windows instead of truncating at 512 tokens
+        self.windows = (windows or WindowConfig()) if long_doc else None
+        # Load classifiers: the shared-backbone model if trained, else the two separate heads
+        self.multitask = (MODEL_OUT_DIR / MULTITASK_NAME).exists()
+        if self.multitask:
+            self.mt_tok, self.mt_mdl = _load_multitask(backend=backend)
+        else:
+            self.dt_tok, self.dt_mdl = _load_clf("doc_type_clf", backend)
+            self.risk_tok, self.risk_mdl = _load_clf("risk_clf", backend)
+        # Retriever: one shared encoder, per-namespace indices cached on demand
+        self.regulator_ns = regulator_ns
+        self.searchers = SearcherRegistry()
+        self.searchers.get(regulator_ns)
+        # Scoring config compiled once
+        self.scorer = load_scoring_engine()
+
+    def classify_batch(self, texts: List[str]) -> List[Tuple[Dict, Dict]]:
+        """(doc_type, risk) predictions for each document."""
+        if self.multitask:
+            return _predict_multitask_batch(texts, self.mt_tok, self.mt_mdl, self.windows)
+        doc_types = _predict_cls_batch(texts, self.dt_tok, self.dt_mdl, DOC_TYPE_LABELS, self.windows)
+        # Risk prediction (baseline uses raw text; you can concatenate hits texts for stronger signal)
+        risks = _predict_cls_batch(texts, self.risk_tok, self.risk_mdl, RISK_LABELS, self.windows)
+        return list(zip(doc_types, risks))
+
+    def classify(self, text: str):
+        return self.classify_batch([text])[0]
+
+    def run_batch(self, texts: List[str], k: int = 5, regulator_ns: Optional[str] = None) -> List[Dict[str, Any]]:
+        # 1) Document type + risk
+        preds = self.classify_batch(texts)
+
+        # 2) Retrieve top-k relevant regulatory articles (one encode + one FAISS search)
+        ns = regulator_ns or self.regulator_ns
+        hits = self.searchers.search_batch(ns, texts, k=k)
+
+        # 3) Readiness, final risk label and ranked gaps for the whole batch
+        risk_probs = np.asarray([[risk["probs"][l] for l in RISK_LABELS] for _, risk in preds])
+        scores = self.scorer.score_batch(risk_probs, hits, self.searchers.get(ns).store.domain_counts())
+
+        return [
+            {"doc_type": doc_type, "risk": risk, "retrieved": h, "score": s}
+            for (doc_type, risk), h, s in zip(preds, hits, scores)
+        ]
+
+    def run(self, text: str, k: int = 5, regulator_ns: Optional[str] = None) -> Dict[str, Any]:
+        return self.run_batch([text], k=k, regulator_ns=regulator_ns)[0]
+
     def set_regulator(self, regulator_ns: str):
-        """Allows updating the search context without reloading heavy classifiers."""
-        if self.searcher.regulator_ns != regulator_ns:
-            self.searcher = RegulatorSearcher(regulator_ns) 
-            # Note: This requires RegulatorSearcher to handle efficient index switching.
-            self.searcher.regulator_ns = regulator_ns # Assuming RegulatorSearcher doesn't have a built-in property for this
+        """Changes the default namespace. Prefer passing `regulator_ns` per call (safe under concurrency)."""
+        self.searchers.get(regulator_ns)
+        self.regulator_ns = regulator_ns
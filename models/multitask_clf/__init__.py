@@ -0,0 +1 @@
+"""Multi-task classifier: one shared encoder with doc_type and risk heads."""
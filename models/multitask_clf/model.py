@@ -0,0 +1,82 @@
+"""
+Shared-backbone classifier for doc_type and risk.
+- One transformer encoder, two small classification heads
+- One tokenization + one forward pass returns both sets of logits
+- save_pretrained()/from_pretrained() mirror the HF layout:
+    <dir>/encoder/   (AutoModel weights + config)
+    <dir>/heads.pt   (head weights)
+    <dir>/multitask.json
+"""
+import json
+from pathlib import Path
+from typing import Dict, Optional
+import torch
+from torch import nn
+from transformers import AutoModel
+
+HEADS_FILE = "heads.pt"
+CONFIG_FILE = "multitask.json"
+
+class ClassificationHead(nn.Module):
+    """Same shape as RobertaClassificationHead: dense → tanh → dropout → out_proj on <s>."""
+    def __init__(self, hidden_size: int, num_labels: int, dropout: float = 0.1):
+        super().__init__()
+        self.dense = nn.Linear(hidden_size, hidden_size)
+        self.dropout = nn.Dropout(dropout)
+        self.out_proj = nn.Linear(hidden_size, num_labels)
+
+    def forward(self, features):
+        x = self.dropout(features[:, 0, :])
+        x = torch.tanh(self.dense(x))
+        return self.out_proj(self.dropout(x))
+
+class MultiTaskClassifier(nn.Module):
+    def __init__(self, encoder, num_doc_type_labels: int, num_risk_labels: int, risk_loss_weight: float = 1.0):
+        super().__init__()
+        self.encoder = encoder
+        self.config = encoder.config  # lets HF Trainer treat this like a PreTrainedModel where it peeks
+        hidden = encoder.config.hidden_size
+        self.doc_type_head = ClassificationHead(hidden, num_doc_type_labels)
+        self.risk_head = ClassificationHead(hidden, num_risk_labels)
+        self.risk_loss_weight = risk_loss_weight
+        self.num_doc_type_labels = num_doc_type_labels
+        self.num_risk_labels = num_risk_labels
+
+    @classmethod
+    def from_backbone(cls, backbone: str, num_doc_type_labels: int, num_risk_labels: int, **kwargs):
+        return cls(AutoModel.from_pretrained(backbone), num_doc_type_labels, num_risk_labels, **kwargs)
+
+    def forward(self, input_ids, attention_mask=None, doc_type_labels=None, risk_labels=None) -> Dict[str, torch.Tensor]:
+        hidden = self.encoder(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+        doc_type_logits = self.doc_type_head(hidden)
+        risk_logits = self.risk_head(hidden)
+        if doc_type_labels is None or risk_labels is None:
+            return {"doc_type_logits": doc_type_logits, "risk_logits": risk_logits}
+
+        ce = nn.functional.cross_entropy
+        loss = ce(doc_type_logits, doc_type_labels) + self.risk_loss_weight * ce(risk_logits, risk_labels)
+        # Trainer reads outputs["loss"] and treats the remaining keys, in order, as the logits
+        return {"loss": loss, "doc_type_logits": doc_type_logits, "risk_logits": risk_logits}
+
+    def save_pretrained(self, path: str):
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self.encoder.save_pretrained(str(path / "encoder"))
+        heads = {"doc_type_head": self.doc_type_head.state_dict(), "risk_head": self.risk_head.state_dict()}
+        torch.save(heads, path / HEADS_FILE)
+        (path / CONFIG_FILE).write_text(json.dumps({
+            "num_doc_type_labels": self.num_doc_type_labels,
+            "num_risk_labels": self.num_risk_labels,
+            "risk_loss_weight": self.risk_loss_weight,
+        }, indent=2), encoding="utf-8")
+
+    @classmethod
+    def from_pretrained(cls, path: str, map_location: Optional[str] = None) -> "MultiTaskClassifier":
+        path = Path(path)
+        cfg = json.loads((path / CONFIG_FILE).read_text(encoding="utf-8"))
+        model = cls(AutoModel.from_pretrained(str(path / "encoder")), cfg["num_doc_type_labels"],
+                    cfg["num_risk_labels"], cfg.get("risk_loss_weight", 1.0))
+        heads = torch.load(path / HEADS_FILE, map_location=map_location or "cpu")
+        model.doc_type_head.load_state_dict(heads["doc_type_head"])
+        model.risk_head.load_state_dict(heads["risk_head"])
+        return model
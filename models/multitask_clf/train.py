@@ -0,0 +1,55 @@
+"""
+Train the shared-backbone doc_type + risk classifier with visible tqdm progress.
+Both heads are trained jointly from the same splits and the same cached tokenization.
+"""
+import argparse
+from transformers import DataCollatorWithPadding
+from models.multitask_clf.model import MultiTaskClassifier
+from models.preprocessing.datasets import load_splits, tokenize_multitask, LABEL_COLUMNS
+from models.training.utils import build_training_args, seed_everything, BATCHING_MODES
+from models.training.sampling import BucketedTrainer
+from models.training.callbacks import TqdmLogger
+from models.evaluation.metrics import compute_multitask_metrics
+from models.config.defaults import (
+    DOC_TYPE_BACKBONE, NUM_DOC_TYPE_LABELS, NUM_RISK_LABELS, MODEL_OUT_DIR, MAX_TOKENS_PER_BATCH
+)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batching", choices=BATCHING_MODES, default="default",
+                    help="default: fixed batches | length: length-grouped | tokens: token-budget batches")
+    ap.add_argument("--max-tokens", type=int, default=MAX_TOKENS_PER_BATCH)
+    ap.add_argument("--risk-loss-weight", type=float, default=1.0)
+    cli = ap.parse_args()
+
+    seed_everything(42)
+    dd = load_splits()
+    tokenized, tok = tokenize_multitask(dd, DOC_TYPE_BACKBONE)
+
+    model = MultiTaskClassifier.from_backbone(
+        DOC_TYPE_BACKBONE, NUM_DOC_TYPE_LABELS, NUM_RISK_LABELS, risk_loss_weight=cli.risk_loss_weight
+    )
+
+    args = build_training_args(
+        "multitask_clf", batching=cli.batching,
+        label_names=[LABEL_COLUMNS["doc_type"], LABEL_COLUMNS["risk"]],
+    )
+    trainer = BucketedTrainer(
+        model=model,
+        args=args,
+        train_dataset=tokenized.get("train"),
+        eval_dataset=tokenized.get("validation"),
+        tokenizer=tok,
+        data_collator=DataCollatorWithPadding(tok),  # pad to the longest example in each batch
+        compute_metrics=compute_multitask_metrics,
+        callbacks=[TqdmLogger()],  # <-- progress bar callback
+        max_tokens_per_batch=cli.max_tokens if cli.batching == "tokens" else None,
+    )
+    trainer.train()
+    out = MODEL_OUT_DIR / "multitask_clf"
+    model.save_pretrained(str(out))
+    tok.save_pretrained(str(out))
+    print(f"[multitask] saved to {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Token-aware chunking with the retriever tokenizer.
+- chunk_texts(): batched split of documents into overlapping token windows
+- Each chunk keeps char offsets back into its source text, so hits can be traced
+Used by the ingestion chunk stage, build_index (--chunked) and query-side search.
+"""
+from typing import Dict, List
+from transformers import AutoTokenizer
+from models.config.defaults import MODEL_OUT_DIR, RETRIEVER_BACKBONE, CHUNK_MAX_TOKENS, CHUNK_OVERLAP
+
+def load_chunk_tokenizer():
+    """Tokenizer of the saved retriever if present, else of the retriever backbone."""
+    path = MODEL_OUT_DIR / "retriever"
+    name = str(path) if path.exists() else RETRIEVER_BACKBONE
+    return AutoTokenizer.from_pretrained(name, use_fast=True)
+
+def _windows(n_tokens: int, max_tokens: int, overlap: int):
+    step = max(1, max_tokens - overlap)
+    start = 0
+    while True:
+        end = min(start + max_tokens, n_tokens)
+        yield start, end
+        if end >= n_tokens:
+            break
+        start += step
+
+def chunk_texts(
+    texts: List[str],
+    tokenizer,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+) -> List[List[Dict]]:
+    """
+    Split each text into windows of at most `max_tokens` tokens, overlapping by
+    `overlap` tokens. All texts are tokenized in one batched (Rust) call.
+
+    Returns, per input text, a list of:
+      {"chunk_index", "char_start", "char_end", "n_tokens", "text"}
+    Empty texts produce no chunks.
+    """
+    enc = tokenizer(
+        texts,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        return_attention_mask=False,
+        truncation=False,
+        verbose=False,
+    )
+    out: List[List[Dict]] = []
+    for text, offsets in zip(texts, enc["offset_mapping"]):
+        chunks = []
+        for start, end in _windows(len(offsets), max_tokens, overlap) if offsets else ():
+            c0, c1 = offsets[start][0], offsets[end - 1][1]
+            chunks.append({
+                "chunk_index": len(chunks),
+                "char_start": int(c0),
+                "char_end": int(c1),
+                "n_tokens": end - start,
+                "text": text[c0:c1],
+            })
+        out.append(chunks)
+    return out
+
+def chunk_text(text: str, tokenizer, max_tokens: int = CHUNK_MAX_TOKENS,
+               overlap: int = CHUNK_OVERLAP) -> List[Dict]:
+    return chunk_texts([text], tokenizer, max_tokens, overlap)[0]
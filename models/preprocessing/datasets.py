@@ -1,18 +1,25 @@
 """
 Dataset helpers for Arrow (HuggingFace Datasets):
 - load_splits(): loads train/val/test Arrow dirs
-- tokenize_*(): prepares tokenized datasets for classifier heads
+- tokenize_multitask(): batched, multi-process tokenization with both label
+  columns, cached on disk under a fingerprint of backbone/MAX_LENGTH/data
+- tokenize_*(): per-head views of the cached tokenization
 - lazy_text(): allows deferred file reading for large docs (paths in rows)
 """
 from typing import Tuple, Dict, Any
 from pathlib import Path
+import hashlib, json, os, shutil
 from datasets import load_from_disk, DatasetDict
 from transformers import AutoTokenizer
 from models.config.defaults import (
-    DATA_DIR, DOC_TYPE_BACKBONE, RISK_BACKBONE, MAX_LENGTH,
-    DOC_TYPE_LABELS, RISK_LABELS
+    DATA_DIR, ARTIFACTS_DIR, TOKENIZED_DIR, DOC_TYPE_BACKBONE, RISK_BACKBONE, MAX_LENGTH,
+    DOC_TYPE_LABELS, RISK_LABELS, TOKENIZE_NUM_PROC
 )
 
+# Bump when _prep_batch changes, so stale caches are not reused
+TOKENIZE_CACHE_VERSION = 2
+LABEL_COLUMNS = {"doc_type": "doc_type_labels", "risk": "risk_labels"}
+
 def load_splits() -> DatasetDict:
     """
     Expects:
@@ -49,41 +56,86 @@ def lazy_text(example, base_dir: Path = Path("data")):
         text = ""
     return {"text": text}
 
-def _tokenize(ds, tokenizer, target_key: str, label_list):
-    label2id = {k: i for i, k in enumerate(label_list)}
+def _prep_batch(batch, tokenizer):
+    # Use 'text' field if present; otherwise fall back to the path (add a lazy_text hook to load it)
+    texts = [t if t else (p or "") for t, p in zip(batch["text"], batch["path"])]
+    enc = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+    enc["length"] = [len(ids) for ids in enc["input_ids"]]  # for length-grouped batching
+    for target_key, label_list in (("doc_type", DOC_TYPE_LABELS), ("risk", RISK_LABELS)):
+        label2id = {k: i for i, k in enumerate(label_list)}
+        labels = []
+        for targets in batch["targets"]:
+            label_name = (targets or {}).get(target_key)
+            if label_name is None:
+                raise ValueError(f"Missing target '{target_key}' in row with targets: {targets}")
+            labels.append(label2id[label_name])
+        enc[LABEL_COLUMNS[target_key]] = labels
+    return enc
 
-    def _prep(ex):
-        # Use 'text' field if present; otherwise, you can add a hook to load text from ex['path']
-        text = ex.get("text") or ""
-        enc = tokenizer(
-            text if text else (ex.get("path") or ""),
-            truncation=True, max_length=MAX_LENGTH
-        )
-        label_name = ex.get("targets", {}).get(target_key)
-        if label_name is None:
-            raise ValueError(f"Missing target '{target_key}' in row: {ex}")
-        enc["labels"] = label2id[label_name]
-        return enc
+def _dataset_version(dd: DatasetDict) -> Dict[str, Any]:
+    schema = ARTIFACTS_DIR / "scheme.json"
+    version = json.loads(schema.read_text(encoding="utf-8")).get("version") if schema.exists() else None
+    return {"schema": version, "splits": {k: ds._fingerprint for k, ds in dd.items()}}
 
-    # datasets.map shows its own progress bar; add a descriptive label
-    return ds.map(
-        _prep,
-        batched=False,
-        desc=f"Tokenizing for '{target_key}'",
-        remove_columns=[c for c in ds.column_names if c not in ("text","targets","path")]
-    )
+def tokenized_fingerprint(dd: DatasetDict, backbone: str) -> str:
+    """Stable key for a tokenization: backbone, MAX_LENGTH, label maps and dataset version."""
+    key = {
+        "backbone": backbone,
+        "max_length": MAX_LENGTH,
+        "labels": {"doc_type": DOC_TYPE_LABELS, "risk": RISK_LABELS},
+        "data": _dataset_version(dd),
+        "cache_version": TOKENIZE_CACHE_VERSION,
+    }
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:16]
 
+def tokenize_multitask(dd: DatasetDict, backbone: str = DOC_TYPE_BACKBONE,
+                       num_proc: int = TOKENIZE_NUM_PROC) -> Tuple[DatasetDict, Any]:
+    """
+    Tokenize every split once and attach both `doc_type_labels` and `risk_labels`
+    (plus a `length` column used by length-grouped / token-budget batching).
+
+    The result is saved under TOKENIZED_DIR/<fingerprint>/, so a second call
+    (e.g. training the other head) loads it from disk instead of re-tokenizing.
+    """
+    tok = AutoTokenizer.from_pretrained(backbone, use_fast=True)
+    cache_dir = TOKENIZED_DIR / tokenized_fingerprint(dd, backbone)
+    if cache_dir.exists():
+        print(f"[tokenize] reusing cached tokenization {cache_dir}")
+        return load_from_disk(str(cache_dir)), tok
 
-def tokenize_for_doc_type(dd: DatasetDict):
-    tok = AutoTokenizer.from_pretrained(DOC_TYPE_BACKBONE, use_fast=True)
     out = DatasetDict()
     for split, ds in dd.items():
-        out[split] = _tokenize(ds, tok, "doc_type", DOC_TYPE_LABELS)
-    return out, tok
+        # datasets.map shows its own progress bar; add a descriptive label
+        out[split] = ds.map(
+            _prep_batch,
+            batched=True,
+            num_proc=num_proc if num_proc > 1 and len(ds) > num_proc else None,
+            fn_kwargs={"tokenizer": tok},
+            remove_columns=ds.column_names,
+            desc=f"Tokenizing '{split}'",
+        )
+
+    tmp_dir = cache_dir.with_name(cache_dir.name + ".tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    out.save_to_disk(str(tmp_dir))
+    os.replace(tmp_dir, cache_dir)
+    print(f"[tokenize] cached tokenization at {cache_dir}")
+    return load_from_disk(str(cache_dir)), tok
+
+def _for_head(tokenized: DatasetDict, target_key: str) -> DatasetDict:
+    """View of the shared tokenization with one target renamed to `labels`."""
+    keep = LABEL_COLUMNS[target_key]
+    drop = [c for c in LABEL_COLUMNS.values() if c != keep]
+    return DatasetDict({
+        split: ds.remove_columns(drop).rename_column(keep, "labels") for split, ds in tokenized.items()
+    })
+
+
+def tokenize_for_doc_type(dd: DatasetDict):
+    tokenized, tok = tokenize_multitask(dd, DOC_TYPE_BACKBONE)
+    return _for_head(tokenized, "doc_type"), tok
 
 def tokenize_for_risk(dd: DatasetDict):
-    tok = AutoTokenizer.from_pretrained(RISK_BACKBONE, use_fast=True)
-    out = DatasetDict()
-    for split, ds in dd.items():
-        out[split] = _tokenize(ds, tok, "risk", RISK_LABELS)
-    return out, tok
+    tokenized, tok = tokenize_multitask(dd, RISK_BACKBONE)
+    return _for_head(tokenized, "risk"), tok
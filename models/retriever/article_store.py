@@ -0,0 +1,159 @@
+"""
+Columnar article store for a regulator index (replaces mapping.json).
+- One Arrow IPC file (uncompressed) per index version: articles.arrow
+- Row id == faiss id; removed rows are kept with deleted=True so ids stay aligned
+- Opened with a memory map: nothing is materialized up front, fields are read
+  lazily per hit, and worker processes share the pages through the OS cache
+Indices written before the store existed fall back to mapping.json (JsonArticleStore).
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+STORE_FILE = "articles.arrow"
+LEGACY_MAPPING = "mapping.json"
+
+SCHEMA = pa.schema([
+    ("article_id", pa.string()),
+    ("title", pa.string()),
+    ("domain", pa.string()),
+    ("confidence", pa.float64()),
+    ("text", pa.large_string()),
+    ("content_hash", pa.string()),
+    ("deleted", pa.bool_()),
+    ("chunk_index", pa.int32()),
+    ("char_start", pa.int64()),
+    ("char_end", pa.int64()),
+    ("extra", pa.string()),  # any other rule-pack fields, as JSON
+])
+_COLUMNS = [f.name for f in SCHEMA if f.name not in ("deleted", "extra")]
+
+def _to_record(row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if row is None:
+        return {"deleted": True}
+    rec = {k: row.get(k) for k in _COLUMNS}
+    if rec["article_id"] is not None:
+        rec["article_id"] = str(rec["article_id"])
+    extra = {k: v for k, v in row.items() if k not in _COLUMNS}
+    rec["extra"] = json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+    rec["deleted"] = False
+    return rec
+
+def write_article_store(path: Path, rows: List[Optional[Dict[str, Any]]]):
+    """rows[i] is the article (or chunk) behind faiss id i, or None if removed."""
+    table = pa.Table.from_pylist([_to_record(r) for r in rows], schema=SCHEMA)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+        writer.write_table(table, max_chunksize=64 * 1024)
+
+class ArticleStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.table = pa.ipc.open_file(pa.memory_map(str(self.path), "r")).read_all()  # zero-copy views
+        self._cols = {name: self.table.column(name) for name in self.table.column_names}
+        chunk_index = self._cols["chunk_index"]
+        self.chunked = chunk_index.null_count < len(chunk_index)
+        self.resident_bytes = 0  # pages belong to the OS cache, reclaimable and shared across workers
+        self._codes = None
+        self._domains = None
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    def _value(self, name: str, i: int):
+        return self._cols[name][i].as_py()
+
+    def get(self, i: int, fields=("article_id", "title", "domain", "confidence"),
+            text_chars: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Selected fields of row i (None if removed); text is cut to `text_chars` before decoding."""
+        if self._value("deleted", i):
+            return None
+        out = {f: self._value(f, i) for f in fields}
+        if text_chars is not None:
+            text = pc.utf8_slice_codeunits(self._cols["text"].slice(i, 1), 0, text_chars)
+            out["text"] = text[0].as_py() or ""
+        return out
+
+    def article_codes(self) -> np.ndarray:
+        """Dense integer id of each row's article (-1 for removed rows), for vectorized per-article grouping."""
+        if self._codes is None:
+            enc = pc.dictionary_encode(self._cols["article_id"]).combine_chunks()
+            codes = pc.fill_null(enc.indices, -1).to_numpy(zero_copy_only=False).astype(np.int64)
+            codes[self._cols["deleted"].to_numpy(zero_copy_only=False)] = -1
+            self._codes = codes
+        return self._codes
+
+    def domain_counts(self) -> Dict[str, int]:
+        """Live articles per domain (chunks of one article counted once), for dynamic domain weights."""
+        if self._domains is None:
+            codes = self.article_codes()
+            live = np.flatnonzero(codes >= 0)
+            _, first = np.unique(codes[live], return_index=True)
+            rows = pa.array(live[first])
+            counts = pc.value_counts(pc.take(self._cols["domain"], rows))
+            self._domains = {d["values"].as_py(): d["counts"].as_py() for d in counts}
+        return self._domains
+
+    def to_rows(self) -> List[Optional[Dict[str, Any]]]:
+        """Every row as a dict (index updates only; defeats the lazy loading)."""
+        rows = []
+        for rec in self.table.to_pylist():
+            if rec.pop("deleted"):
+                rows.append(None)
+                continue
+            extra = rec.pop("extra")
+            row = {k: v for k, v in rec.items() if v is not None or k in ("title", "text")}
+            row.update(json.loads(extra) if extra else {})
+            rows.append(row)
+        return rows
+
+class JsonArticleStore:
+    """Same interface over a legacy mapping.json (fully loaded)."""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.rows = json.loads(self.path.read_text(encoding="utf-8"))
+        live = next((r for r in self.rows if r), None)
+        self.chunked = live is not None and "chunk_index" in live
+        self.resident_bytes = self.path.stat().st_size
+        self._codes = None
+        self._domains = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def get(self, i: int, fields=("article_id", "title", "domain", "confidence"),
+            text_chars: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        row = self.rows[i]
+        if row is None:
+            return None
+        out = {f: row.get(f) for f in fields}
+        if text_chars is not None:
+            out["text"] = (row.get("text") or "")[:text_chars]
+        return out
+
+    def article_codes(self) -> np.ndarray:
+        if self._codes is None:
+            ids: Dict[str, int] = {}
+            self._codes = np.asarray([ids.setdefault(str(r.get("article_id")), len(ids)) if r else -1
+                                      for r in self.rows], dtype=np.int64)
+        return self._codes
+
+    def domain_counts(self) -> Dict[str, int]:
+        if self._domains is None:
+            seen: Dict[str, str] = {}
+            for r in self.rows:
+                if r:
+                    seen.setdefault(str(r.get("article_id")), r.get("domain"))
+            self._domains = dict(Counter(seen.values()))
+        return self._domains
+
+    def to_rows(self) -> List[Optional[Dict[str, Any]]]:
+        return self.rows
+
+def open_article_store(idx_dir: Path):
+    if (idx_dir / STORE_FILE).exists():
+        return ArticleStore(idx_dir / STORE_FILE)
+    return JsonArticleStore(idx_dir / LEGACY_MAPPING)
@@ -0,0 +1,95 @@
+"""
+Recall / latency / size benchmark of FAISS index types against exact search.
+- Embeds a regulator's articles (or chunks) once, or uses synthetic unit vectors
+- Builds flat (ground truth) plus each candidate configuration on the same vectors
+- Queries: a held-out sample of the embeddings, lightly perturbed
+- Reports recall@k vs flat, p50/p99 single-query latency, index size and build time
+Writes REPORTS_DIR/index_benchmark_<ns>.json.
+
+Run:
+  python -m models.retriever.benchmark_index --ns qcb --chunked
+  python -m models.retriever.benchmark_index --synthetic 200000 --dim 768
+"""
+import argparse
+import json
+import time
+from typing import Dict, List
+import numpy as np
+from models.config.defaults import REPORTS_DIR
+from models.retriever.faiss_index import IndexConfig, build_faiss_index, index_nbytes, type_params
+
+CANDIDATES = [
+    IndexConfig(type="ivf_flat", nprobe=8),
+    IndexConfig(type="ivf_flat", nprobe=32),
+    IndexConfig(type="ivf_pq", nprobe=16, pq_m=16),
+    IndexConfig(type="ivf_pq", nprobe=64, pq_m=32),
+    IndexConfig(type="hnsw", hnsw_m=32, ef_search=64),
+    IndexConfig(type="hnsw", hnsw_m=32, ef_search=256),
+]
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype("float32")
+
+def make_queries(emb: np.ndarray, n: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    q = emb[rng.choice(len(emb), min(n, len(emb)), replace=False)]
+    return _normalize(q + noise * rng.standard_normal(q.shape).astype("float32") / np.sqrt(emb.shape[1]))
+
+def evaluate(index, queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    lat = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, q in enumerate(queries):  # one query at a time: the serving access pattern
+        t = time.perf_counter()
+        _, idx = index.search(q[None, :], k)
+        lat.append((time.perf_counter() - t) * 1000)
+        found[i] = idx[0]
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    return {"recall_at_k": float(recall), "p50_ms": float(np.percentile(lat, 50)),
+            "p99_ms": float(np.percentile(lat, 99)), "size_mb": index_nbytes(index) / 2**20}
+
+def run(emb: np.ndarray, configs: List[IndexConfig], k: int, n_queries: int) -> List[Dict]:
+    queries = make_queries(emb, n_queries)
+    t = time.perf_counter()
+    flat = build_faiss_index(emb, IndexConfig(type="flat"))
+    flat_build = time.perf_counter() - t
+    _, truth = flat.search(queries, k)
+    rows = [{"type": "flat", "build_s": flat_build, **evaluate(flat, queries, truth, k)}]
+    for cfg in configs:
+        t = time.perf_counter()
+        index = build_faiss_index(emb, cfg)
+        build = time.perf_counter() - t
+        rows.append({"type": cfg.type, "params": type_params(cfg), "build_s": build, **evaluate(index, queries, truth, k)})
+    return rows
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ns", default="synthetic")
+    ap.add_argument("--chunked", action="store_true")
+    ap.add_argument("--synthetic", type=int, default=0, help="use N random unit vectors instead of a rule-pack")
+    ap.add_argument("--dim", type=int, default=768)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--queries", type=int, default=500)
+    args = ap.parse_args()
+
+    if args.synthetic:
+        emb = _normalize(np.random.default_rng(42).standard_normal((args.synthetic, args.dim)).astype("float32"))
+    else:
+        from models.retriever.build_index import encode_articles
+        _, emb = encode_articles(args.ns.lower(), args.chunked)
+    configs = [c for c in CANDIDATES if c.type != "ivf_pq" or emb.shape[1] % c.pq_m == 0]
+
+    rows = run(emb, configs, args.k, args.queries)
+    print(f"[bench] n={len(emb)} dim={emb.shape[1]} k={args.k}")
+    for r in rows:
+        knobs = ", ".join(f"{k}={v}" for k, v in r.get("params", {}).items())
+        print(f"[bench] {r['type']:<9} {knobs:<44} recall@{args.k}={r['recall_at_k']:.3f} "
+              f"p50={r['p50_ms']:.2f}ms p99={r['p99_ms']:.2f}ms size={r['size_mb']:.1f}MB build={r['build_s']:.1f}s")
+
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    out = REPORTS_DIR / f"index_benchmark_{args.ns.lower()}.json"
+    out.write_text(json.dumps({"n": len(emb), "dim": int(emb.shape[1]), "k": args.k, "results": rows}, indent=2),
+                   encoding="utf-8")
+    print(f"[bench] wrote {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,167 @@
 """
 Build a FAISS index for a regulator's rule-pack articles.
-- Reads config/regulators/<ns>.yaml
-- Encodes each article text with the retriever model
-- Saves FAISS index + mapping under indices/<ns>/
+- Reads config/regulators/<ns>.yaml (through the compiled cache, see rulepack.py)
+- Encodes each article text with the retriever model (through the embedding cache,
+  so unchanged texts are not re-encoded)
+  (or, with --chunked, each overlapping token chunk of every article; chunks
+  precomputed by src/ingest/chunk_corpus.py under CHUNKS_DIR/<ns> are used when
+  present — they cover the full source .txt, not the truncated rule-pack text —
+  and articles missing from that dataset are chunked here)
+- Builds a flat (exact), IVF-Flat, IVF-PQ or HNSW index (see faiss_index.py)
+- Saves FAISS index + index_meta.json + Arrow article store as a new version under indices/<ns>/
+  (see index_store.py); --update re-encodes only new/changed articles
 
 Run:
-  python -m models.retriever.build_index --ns qcb
+  python -m models.retriever.build_index --ns qcb [--chunked]
+  python -m models.retriever.build_index --ns qcb --chunked --index-type hnsw --ef-search 128
+  python -m models.retriever.build_index --ns qcb --chunked --index-type ivf_pq --nlist 256 --pq-m 16
+  python -m models.retriever.build_index --ns qcb --update
 """
-import argparse, yaml, json
-from pathlib import Path
+import argparse
+from typing import Dict, List, Optional
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
-from models.config.defaults import ROOT_DIR, MODEL_OUT_DIR, DEVICE
+from models.config.defaults import CHUNKS_DIR
+from models.preprocessing.chunking import chunk_texts
+from models.retriever.faiss_index import (
+    INDEX_TYPES, IndexConfig, build_faiss_index, read_meta, supports_ids, update_faiss_index,
+)
+from models.retriever.index_store import article_hash, current_dir, write_version
+from models.retriever.search import load_encoder
+from models.retriever.article_store import open_article_store
+from models.retriever.rulepack import load_rulepack
 
-def load_rulepack(ns: str):
-    p = ROOT_DIR / "config" / "regulators" / f"{ns}.yaml"
-    if not p.exists():
-        raise FileNotFoundError(f"Rule-pack not found: {p}")
-    return yaml.safe_load(p.read_text(encoding="utf-8"))
+def load_corpus_chunks(ns: str) -> Dict[str, List[Dict]]:
+    """
+    Chunks from the chunk_corpus dataset (CHUNKS_DIR/<ns>), grouped by source doc sha1
+    (== rule-pack article_id, the stem of its <sha1>.txt); empty if it was never built.
+    """
+    path = CHUNKS_DIR / ns
+    if not path.exists():
+        return {}
+    from datasets import load_from_disk
+    cols = ["doc_sha1", "chunk_index", "char_start", "char_end", "text"]
+    out = {}
+    for c in load_from_disk(str(path)).select_columns(cols).to_list():
+        out.setdefault(c.pop("doc_sha1"), []).append(c)
+    for chunks in out.values():
+        chunks.sort(key=lambda c: c["chunk_index"])
+    print(f"[index] ns={ns} using {sum(map(len, out.values()))} precomputed chunks of {len(out)} docs from {path}")
+    return out
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--ns", required=True)
-    args = ap.parse_args()
-    ns = args.ns.lower()
+def chunk_articles(arts, tokenizer, corpus_chunks: Optional[Dict[str, List[Dict]]] = None):
+    """One mapping entry per chunk; each keeps its article fields plus char offsets."""
+    corpus_chunks = corpus_chunks or {}
+    todo = [a.get("text") or "" for a in arts if str(a.get("article_id")) not in corpus_chunks]
+    fresh = iter(chunk_texts(todo, tokenizer) if todo else [])
+    out = []
+    for art in arts:
+        aid = str(art.get("article_id"))
+        for c in (corpus_chunks[aid] if aid in corpus_chunks else next(fresh)):
+            out.append({**art, "text": c["text"], "chunk_index": c["chunk_index"],
+                        "char_start": c["char_start"], "char_end": c["char_end"]})
+    return out
 
-    rp = load_rulepack(ns)
-    arts = rp.get("articles", [])
+def encode_rows(model, arts, chunked: bool = False, ns: Optional[str] = None):
+    """Mapping rows (articles or their chunks, tagged with the article content hash) and their embeddings."""
+    arts = [{**a, "content_hash": article_hash(a)} for a in arts]
+    if chunked:
+        arts = chunk_articles(arts, model.tokenizer, load_corpus_chunks(ns) if ns else None)
+    texts = [f"{a.get('title','')}\n\n{a.get('text','')}" for a in arts]
+    emb = model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=True)
+    return arts, np.asarray(emb, dtype="float32").reshape(len(arts), -1)
+
+def encode_articles(ns: str, chunked: bool = False):
+    """Rule-pack articles (or their chunks) and their normalized float32 embeddings."""
+    arts = load_rulepack(ns).get("articles", [])
     if not arts:
         raise SystemExit(f"No articles in rule-pack for ns={ns}")
+    return encode_rows(load_encoder(), arts, chunked, ns)
 
-    # load retriever
-    model_dir = MODEL_OUT_DIR / "retriever"
-    model = SentenceTransformer(str(model_dir), device=DEVICE)
+def update_index(ns: str):
+    """
+    Diff the rule-pack against the live mapping by article_id + content hash:
+    encode only new/changed articles, drop removed ones, write a new version.
+    """
+    idx_dir = current_dir(ns)
+    if not (idx_dir / "articles.index").exists():
+        raise SystemExit(f"No index for ns={ns}; run a full build first")
+    index = faiss.read_index(str(idx_dir / "articles.index"))
+    if not supports_ids(index):
+        raise SystemExit(f"Index for ns={ns} predates id mapping; run a full build once")
+    cfg = read_meta(idx_dir)
+    store = open_article_store(idx_dir)
+    mapping, chunked = list(store.to_rows()), store.chunked
 
-    texts = [f"{a.get('title','')}\n\n{a.get('text','')}" for a in arts]
-    emb = model.encode(texts, batch_size=64, normalize_embeddings=True, show_progress_bar=True)
-    emb = emb.astype("float32")
+    arts = {str(a["article_id"]): a for a in load_rulepack(ns).get("articles", [])}
+    old_rows, old_hash = {}, {}
+    for row_id, r in enumerate(mapping):
+        if r:
+            old_rows.setdefault(str(r["article_id"]), []).append(row_id)
+            old_hash[str(r["article_id"])] = r.get("content_hash")
+    changed = [a for aid, a in arts.items() if old_hash.get(aid) != article_hash(a)]
+    removed = set(old_rows) - set(arts)
+    stale = removed | ({str(a["article_id"]) for a in changed} & set(old_rows))
+    remove_ids = np.array(sorted(i for aid in stale for i in old_rows[aid]), dtype=np.int64)
+    if not changed and not len(remove_ids):
+        print(f"[index] ns={ns} up to date ({len(arts)} articles)")
+        return
 
+    rows, emb = encode_rows(load_encoder(), changed, chunked, ns) if changed else ([], None)
+    new_ids = np.arange(len(mapping), len(mapping) + len(rows), dtype=np.int64)
+    if emb is None:
+        emb = np.zeros((0, index.d), dtype="float32")
+    index = update_faiss_index(index, cfg, remove_ids, emb, new_ids)
+    for i in remove_ids:
+        mapping[i] = None  # tombstone: row ids stay aligned with faiss ids
+    mapping.extend(rows)
+
+    out_dir = write_version(ns, index, cfg, mapping)
+    n_new = len([a for a in changed if str(a["article_id"]) not in old_rows])
+    print(f"[index] ns={ns} updated: +{n_new} new, ~{len(changed) - n_new} changed, "
+          f"-{len(removed)} removed ({len(rows)} rows encoded) → {out_dir}")
+
+def add_index_args(ap: argparse.ArgumentParser):
+    d = IndexConfig()
+    ap.add_argument("--index-type", choices=INDEX_TYPES, default=d.type)
+    ap.add_argument("--nlist", type=int, default=d.nlist, help="IVF cells (default ~4*sqrt(n))")
+    ap.add_argument("--nprobe", type=int, default=d.nprobe, help="IVF cells searched per query")
+    ap.add_argument("--pq-m", type=int, default=d.pq_m, help="PQ sub-quantizers (must divide dim)")
+    ap.add_argument("--pq-nbits", type=int, default=d.pq_nbits)
+    ap.add_argument("--hnsw-m", type=int, default=d.hnsw_m)
+    ap.add_argument("--ef-construction", type=int, default=d.ef_construction)
+    ap.add_argument("--ef-search", type=int, default=d.ef_search)
+    ap.add_argument("--train-size", type=int, default=d.train_size, help="max vectors sampled for IVF/PQ training")
+
+def index_config_from_args(args) -> IndexConfig:
+    return IndexConfig(
+        type=args.index_type, nlist=args.nlist, nprobe=args.nprobe, pq_m=args.pq_m, pq_nbits=args.pq_nbits,
+        hnsw_m=args.hnsw_m, ef_construction=args.ef_construction, ef_search=args.ef_search,
+        train_size=args.train_size,
+    )
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ns", required=True)
+    ap.add_argument("--chunked", action="store_true", help="index overlapping token chunks instead of whole articles")
+    ap.add_argument("--update", action="store_true",
+                    help="re-encode only new/changed articles of the live index (keeps its type and chunking)")
+    add_index_args(ap)
+    args = ap.parse_args()
+    ns = args.ns.lower()
+    if args.update:
+        update_index(ns)
+        return
+    cfg = index_config_from_args(args)
 
-    # build FAISS index
-    dim = emb.shape[1]
-    index = faiss.IndexFlatIP(dim)  # cosine via normalized vectors → use Inner Product
-    index.add(emb)
+    arts, emb = encode_articles(ns, args.chunked)
 
-    out_dir = ROOT_DIR / "indices" / ns
-    # out_dir.mkdir(parents=True, exist_ok=True)
-    faiss.write_index(index, str(out_dir / "articles.index"))
+    # build FAISS index (cosine via normalized vectors → Inner Product; faiss id == mapping row)
+    index = build_faiss_index(emb, cfg)
 
-    # store id mapping
-    (out_dir / "mapping.json").write_text(json.dumps(arts, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"[index] ns={ns} dim={dim} added={emb.shape[0]} → {out_dir}")
+    # index + meta + id mapping, switched in atomically
+    out_dir = write_version(ns, index, cfg, arts)
+    print(f"[index] ns={ns} type={cfg.type} dim={index.d} added={index.ntotal} → {out_dir}")
 
 if __name__ == "__main__":
     main()
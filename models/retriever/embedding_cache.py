@@ -0,0 +1,251 @@
+"""
+Persistent embedding cache for the retriever encoder.
+- Keyed by (model fingerprint, hash of whitespace-normalized text)
+- Vectors live in a memory-mapped float16/float32 matrix, one row per text:
+    <EMBED_CACHE_DIR>/<fingerprint>/vectors.<dtype>
+    <EMBED_CACHE_DIR>/<fingerprint>/generations.u64 (per-row write counter)
+    <EMBED_CACHE_DIR>/<fingerprint>/index.sqlite   (hash → row + generation, last_used; free rows)
+    <EMBED_CACHE_DIR>/<fingerprint>/meta.json      (max_rows, dim, dtype of the matrix)
+  A different AIX_EMBED_CACHE_ROWS / dim / dtype than recorded in meta.json rebuilds
+  the cache from empty; other processes notice the new meta.json and remap
+- Size-bounded: rows are handed out from a high-water mark, then from the free-row
+  table; once all `max_rows` are used, the least recently used ~10% are evicted
+  and their rows reused
+- Safe across processes (build_index next to a server): allocating rows, writing the
+  vectors and inserting the keys happen in one sqlite BEGIN IMMEDIATE transaction,
+  so two writers never get the same row. Lookups take no lock: a writer bumps a
+  row's generation before overwriting it, and a copy whose generation changed (or
+  no longer matches the index) is treated as a miss. WAL lets lookups run next to
+  a writer; synchronous=NORMAL keeps commits free of fsyncs.
+- Lookups do not write: LRU stamps are kept in memory and flushed every
+  LRU_FLUSH_EVERY hits / LRU_FLUSH_S seconds, and before any eviction
+- CachedEncoder wraps a SentenceTransformer with the same encode() signature, so
+  build_index and RegulatorSearcher skip the transformer for texts seen before;
+  encode(..., use_cache=False) bypasses it for one-off texts (query documents)
+A retrained retriever gets a new fingerprint, hence a fresh cache.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import numpy as np
+from models.config.defaults import EMBED_CACHE_DIR, EMBED_CACHE_MAX_ROWS, EMBED_CACHE_DTYPE
+
+LAYOUT_VERSION = 2     # bump when the files/tables change → existing caches are rebuilt
+GENERATIONS_FILE = "generations.u64"
+EVICT_FRACTION = 0.1
+LRU_FLUSH_EVERY = 5000
+LRU_FLUSH_S = 30.0
+_WS = re.compile(r"\s+")
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(_WS.sub(" ", text).strip().encode("utf-8")).hexdigest()
+
+def model_fingerprint(model_dir: Path) -> str:
+    """Cheap identity of a saved model: file names, sizes and mtimes (no weight hashing)."""
+    h = hashlib.sha1(str(model_dir.resolve()).encode("utf-8"))
+    for p in sorted(model_dir.rglob("*")):
+        if p.is_file():
+            st = p.stat()
+            h.update(f"{p.relative_to(model_dir)}:{st.st_size}:{st.st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+class EmbeddingCache:
+    def __init__(self, fingerprint: str, dim: int, max_rows: int = EMBED_CACHE_MAX_ROWS,
+                 dtype: str = EMBED_CACHE_DTYPE, root: Path = EMBED_CACHE_DIR):
+        self.dir = root / fingerprint
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._touched = {}  # key → last_used not yet written to sqlite
+        self._flushed_at = time.time()
+        self._meta_path = self.dir / "meta.json"
+        self._meta_stamp = None
+        # autocommit mode: writes open BEGIN IMMEDIATE explicitly, reads are single statements
+        self.db = sqlite3.connect(str(self.dir / "index.sqlite"), check_same_thread=False,
+                                  timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        with self._write():
+            meta = {"version": LAYOUT_VERSION, "max_rows": max_rows, "dim": dim, "dtype": dtype}
+            old = json.loads(self._meta_path.read_text(encoding="utf-8")) if self._meta_path.exists() else None
+            if old is None or {k: old.get(k) for k in meta} != meta \
+                    or not (self.dir / f"vectors.{dtype}").exists():
+                if old is not None:
+                    print(f"[embed-cache] layout changed {old} -> {meta}; rebuilding {self.dir}")
+                self._rebuild(meta)
+            self.db.execute("CREATE TABLE IF NOT EXISTS entries "
+                            "(key TEXT PRIMARY KEY, row INTEGER UNIQUE, gen INTEGER, last_used REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS free_rows (row INTEGER PRIMARY KEY)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value INTEGER)")
+            self.db.execute("INSERT OR IGNORE INTO state VALUES ('next_row', 0)")
+            self._sync_layout()
+
+    def _rebuild(self, meta: dict):
+        """Fresh, empty matrix + generations + tables (inside the write transaction)."""
+        for p in list(self.dir.glob("vectors.*")) + [self.dir / GENERATIONS_FILE]:
+            p.unlink(missing_ok=True)
+        for table in ("entries", "free_rows", "state"):
+            self.db.execute(f"DROP TABLE IF EXISTS {table}")
+        shape = (meta["max_rows"], meta["dim"])
+        np.memmap(self.dir / f"vectors.{meta['dtype']}", dtype=meta["dtype"], mode="w+", shape=shape).flush()
+        np.memmap(self.dir / GENERATIONS_FILE, dtype=np.uint64, mode="w+", shape=(meta["max_rows"],)).flush()
+        # written to a temp file and renamed: readers detect the rebuild by the new inode/mtime
+        tmp = self._meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({**meta, "built": time.time_ns()}), encoding="utf-8")
+        os.replace(tmp, self._meta_path)
+
+    def _sync_layout(self):
+        """(Re)map vectors + generations if meta.json changed, i.e. some process rebuilt the cache."""
+        st = self._meta_path.stat()
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp == self._meta_stamp:
+            return
+        meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        if meta["dim"] != self.dim:
+            raise ValueError(f"Embedding cache {self.dir} holds dim {meta['dim']}, encoder has {self.dim}")
+        if self._meta_stamp is not None:
+            print(f"[embed-cache] {self.dir} was rebuilt by another process; remapping")
+        self.max_rows, self.dtype = int(meta["max_rows"]), meta["dtype"]
+        self.vectors = np.memmap(self.dir / f"vectors.{self.dtype}", dtype=self.dtype, mode="r+",
+                                 shape=(self.max_rows, self.dim))
+        self.gens = np.memmap(self.dir / GENERATIONS_FILE, dtype=np.uint64, mode="r+", shape=(self.max_rows,))
+        self._touched.clear()  # stamps of the old cache's keys
+        self._meta_stamp = stamp
+
+    @contextmanager
+    def _write(self):
+        """One BEGIN IMMEDIATE transaction: the cross-process write lock."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_many(self, keys: List[str]) -> dict:
+        """key → float32 vector for the keys present; their LRU stamp is refreshed in memory."""
+        if not keys:
+            return {}
+        with self._lock:
+            rows = []
+            for i in range(0, len(keys), 500):  # sqlite variable limit
+                part = keys[i:i + 500]
+                q = f"SELECT key, row, gen FROM entries WHERE key IN ({','.join('?' * len(part))})"
+                rows.extend(self.db.execute(q, part).fetchall())
+            # after the lookup: a rebuild rewrites meta.json before its tables commit
+            self._sync_layout()
+            out = {}
+            for k, r, g in rows:
+                # seqlock-style check: a writer bumps gens[r] before it overwrites row r,
+                # so an unchanged generation around the copy means the copy is intact
+                if r < self.max_rows and self.gens[r] == g:
+                    v = np.array(self.vectors[r], dtype=np.float32)
+                    if self.gens[r] == g:
+                        out[k] = v
+            now = time.time()
+            self._touched.update((k, now) for k in out)
+            if len(self._touched) >= LRU_FLUSH_EVERY or now - self._flushed_at > LRU_FLUSH_S:
+                with self._write():
+                    self._flush_stamps()
+            return out
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        if not keys:
+            return
+        with self._lock, self._write():
+            self._sync_layout()
+            self._flush_stamps()
+            rows = self._allocate(len(keys))
+            keys = keys[:len(rows)]
+            gens = self.gens[rows] + 1
+            self.gens[rows] = gens  # invalidates concurrent readers of these rows first
+            for r, v in zip(rows, vectors):
+                self.vectors[r] = v
+            self.vectors.flush()
+            self.gens.flush()
+            # rows are written before they become visible through the index; a key
+            # another process inserted meanwhile gives its old row back
+            for k in keys:
+                prev = self.db.execute("SELECT row FROM entries WHERE key=?", (k,)).fetchone()
+                if prev is not None:
+                    self.db.execute("INSERT INTO free_rows VALUES (?)", prev)
+            now = time.time()
+            self.db.executemany("INSERT OR REPLACE INTO entries (key, row, gen, last_used) VALUES (?, ?, ?, ?)",
+                                [(k, int(r), int(g), now) for k, r, g in zip(keys, rows, gens.tolist())])
+
+    def flush(self):
+        """Write pending LRU stamps to sqlite."""
+        with self._lock, self._write():
+            self._flush_stamps()
+
+    def _flush_stamps(self):
+        # inside a write transaction; max() keeps a newer stamp written by another process
+        if self._touched:
+            self.db.executemany("UPDATE entries SET last_used=max(last_used, ?) WHERE key=?",
+                                [(t, k) for k, t in self._touched.items()])
+            self._touched.clear()
+        self._flushed_at = time.time()
+
+    def _take_free(self, n: int) -> List[int]:
+        rows = [r for (r,) in self.db.execute("SELECT row FROM free_rows LIMIT ?", (n,))]
+        self.db.executemany("DELETE FROM free_rows WHERE row=?", [(r,) for r in rows])
+        nxt = self.db.execute("SELECT value FROM state WHERE name='next_row'").fetchone()[0]
+        fresh = list(range(nxt, min(self.max_rows, nxt + n - len(rows))))
+        if fresh:
+            self.db.execute("UPDATE state SET value=? WHERE name='next_row'", (fresh[-1] + 1,))
+        return rows + fresh
+
+    def _allocate(self, n: int) -> List[int]:
+        # inside a write transaction, so no other process can hand out the same rows
+        rows = self._take_free(n)
+        if len(rows) < n:
+            n_evict = max(n - len(rows), int(self.max_rows * EVICT_FRACTION))
+            victims = self.db.execute("SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (n_evict,)).fetchall()
+            self.db.executemany("DELETE FROM entries WHERE key=?", [(k,) for k, _ in victims])
+            self.db.executemany("INSERT INTO free_rows VALUES (?)", [(r,) for _, r in victims])
+            rows += self._take_free(n - len(rows))
+        return rows
+
+class CachedEncoder:
+    """Drop-in for SentenceTransformer.encode(..., normalize_embeddings=True) backed by EmbeddingCache."""
+    def __init__(self, model, cache: EmbeddingCache):
+        self.model = model
+        self.cache = cache
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    def encode(self, texts: List[str], batch_size: int = 32, normalize_embeddings: bool = True,
+               show_progress_bar: Optional[bool] = None, use_cache: bool = True, **kwargs) -> np.ndarray:
+        if not use_cache or not normalize_embeddings or kwargs:
+            return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=normalize_embeddings,
+                                     show_progress_bar=show_progress_bar, **kwargs)
+        keys = [text_key(t) for t in texts]
+        found = self.cache.get_many(list(dict.fromkeys(keys)))
+        missing = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                missing.setdefault(k, t)
+        if missing:
+            emb = self.model.encode(list(missing.values()), batch_size=batch_size, normalize_embeddings=True,
+                                    show_progress_bar=show_progress_bar)
+            emb = np.asarray(emb, dtype=np.float32)
+            self.cache.put_many(list(missing), emb)
+            found.update(zip(missing, emb))
+        out = np.empty((len(texts), self.cache.dim), dtype=np.float32)
+        for i, k in enumerate(keys):
+            out[i] = found[k]
+        return out
@@ -0,0 +1,135 @@
+"""
+FAISS index construction and search-time configuration.
+- flat:     exact inner product (IndexFlatIP)
+- ivf_flat: inverted lists over k-means cells, exact vectors (nlist, nprobe)
+- ivf_pq:   inverted lists + product-quantized vectors (nlist, pq_m, pq_nbits, nprobe)
+- hnsw:     graph index (hnsw_m, ef_construction, ef_search); no training
+Vectors are L2-normalized, so inner product = cosine for every type.
+Every index is ID-addressable (IndexIDMap2 for flat/hnsw, native ids for IVF):
+faiss id == row id in the article mapping, so rows can be removed/added in place.
+The type and parameters are written to index_meta.json next to the index,
+and the searcher reads them back to set nprobe / efSearch.
+"""
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Optional
+import json
+import math
+import numpy as np
+import faiss
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+META_FILE = "index_meta.json"
+
+@dataclass
+class IndexConfig:
+    type: str = "flat"
+    nlist: Optional[int] = None    # IVF cells; None → ~4·sqrt(n), capped so each cell gets ≥39 training points
+    nprobe: int = 16               # IVF cells visited per query
+    pq_m: int = 16                 # PQ sub-quantizers (must divide dim)
+    pq_nbits: int = 8              # bits per PQ code
+    hnsw_m: int = 32               # graph degree
+    ef_construction: int = 200
+    ef_search: int = 64
+    train_size: int = 100_000      # max vectors sampled for IVF/PQ training
+    seed: int = 42
+
+TYPE_PARAMS = {
+    "flat": (),
+    "ivf_flat": ("nlist", "nprobe"),
+    "ivf_pq": ("nlist", "nprobe", "pq_m", "pq_nbits"),
+    "hnsw": ("hnsw_m", "ef_construction", "ef_search"),
+}
+
+def type_params(cfg: IndexConfig):
+    """The parameters that matter for cfg.type (for reports)."""
+    return {k: getattr(cfg, k) for k in TYPE_PARAMS.get(cfg.type, ())}
+
+def _auto_nlist(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+def _train_sample(emb: np.ndarray, cfg: IndexConfig) -> np.ndarray:
+    if len(emb) <= cfg.train_size:
+        return emb
+    rng = np.random.default_rng(cfg.seed)
+    return emb[np.sort(rng.choice(len(emb), cfg.train_size, replace=False))]
+
+def build_faiss_index(emb: np.ndarray, cfg: IndexConfig, ids: Optional[np.ndarray] = None) -> faiss.Index:
+    """
+    Build (and train, for IVF types) an index over float32 normalized embeddings.
+    `ids` are the mapping row ids of the vectors (default 0..n-1).
+    """
+    n, dim = emb.shape
+    ids = np.arange(n, dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+    ip = faiss.METRIC_INNER_PRODUCT
+    if cfg.type == "flat":
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    elif cfg.type == "hnsw":
+        inner = faiss.IndexHNSWFlat(dim, cfg.hnsw_m, ip)
+        inner.hnsw.efConstruction = cfg.ef_construction
+        index = faiss.IndexIDMap2(inner)
+    elif cfg.type in ("ivf_flat", "ivf_pq"):
+        cfg.nlist = cfg.nlist or _auto_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if cfg.type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, cfg.nlist, ip)
+        else:
+            if dim % cfg.pq_m:
+                raise ValueError(f"pq_m={cfg.pq_m} must divide embedding dim={dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, cfg.nlist, cfg.pq_m, cfg.pq_nbits, ip)
+        index.train(_train_sample(emb, cfg))
+    else:
+        raise ValueError(f"Unknown index type: {cfg.type} (choose from {INDEX_TYPES})")
+    index.add_with_ids(emb, ids)
+    configure_search(index, cfg)
+    return index
+
+def _inner(index: faiss.Index) -> faiss.Index:
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+def supports_ids(index: faiss.Index) -> bool:
+    """False for indices built before ID mapping (positional ids; remove_ids would shift them)."""
+    return isinstance(index, faiss.IndexIDMap) or isinstance(index, faiss.IndexIVF)
+
+def update_faiss_index(index: faiss.Index, cfg: IndexConfig, remove_ids: np.ndarray,
+                       emb: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """
+    Remove rows by id and add new vectors with their ids.
+    Flat / IVF are edited in place; HNSW cannot delete, so its graph is rebuilt
+    from the stored vectors (no re-encoding).
+    """
+    remove_ids = np.asarray(remove_ids, dtype=np.int64)
+    if cfg.type == "hnsw":
+        inner = _inner(index)
+        old_ids = faiss.vector_to_array(index.id_map)
+        keep = ~np.isin(old_ids, remove_ids)
+        vecs = inner.reconstruct_n(0, inner.ntotal)[keep]
+        return build_faiss_index(np.concatenate([vecs, emb]), cfg, np.concatenate([old_ids[keep], ids]))
+    if len(remove_ids):
+        index.remove_ids(remove_ids)
+    if len(ids):
+        index.add_with_ids(emb, np.asarray(ids, dtype=np.int64))
+    return index
+
+def configure_search(index: faiss.Index, cfg: IndexConfig):
+    """Apply query-time knobs (nprobe / efSearch) to a loaded index."""
+    if cfg.type in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = cfg.nprobe
+    elif cfg.type == "hnsw":
+        _inner(index).hnsw.efSearch = cfg.ef_search
+
+def write_meta(idx_dir: Path, index: faiss.Index, cfg: IndexConfig):
+    meta = {"dim": index.d, "ntotal": int(index.ntotal), "metric": "ip", **asdict(cfg)}
+    (idx_dir / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+def read_meta(idx_dir: Path) -> IndexConfig:
+    """Index config from index_meta.json; indices built before it existed are flat."""
+    p = idx_dir / META_FILE
+    if not p.exists():
+        return IndexConfig()
+    meta = json.loads(p.read_text(encoding="utf-8"))
+    known = IndexConfig.__dataclass_fields__
+    return IndexConfig(**{k: v for k, v in meta.items() if k in known})
+
+def index_nbytes(index: faiss.Index) -> int:
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,69 @@
+"""
+Versioned on-disk layout of a regulator index, so updates are atomic and
+running searchers can hot-swap:
+
+  indices/<ns>/CURRENT          → name of the live version, e.g. "v20250101T120000123456"
+  indices/<ns>/<version>/articles.index
+  indices/<ns>/<version>/articles.arrow   (row id == faiss id; see article_store.py)
+  indices/<ns>/<version>/index_meta.json
+  indices/<ns>/<version>/lexical.npz      (BM25 postings over the same rows; see lexical.py)
+
+A version directory is fully written before CURRENT is switched (tmp file + os.replace).
+Indices built before versioning (files directly in indices/<ns>/) are still readable.
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+import hashlib
+import json
+import os
+import shutil
+import faiss
+from models.config.defaults import ROOT_DIR
+from models.retriever.faiss_index import IndexConfig, write_meta
+from models.retriever.article_store import STORE_FILE, write_article_store
+from models.retriever.lexical import LEXICAL_FILE, write_lexical_index
+
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2  # live version + the previous one (searchers may still be reading it)
+
+def ns_dir(ns: str) -> Path:
+    return ROOT_DIR / "indices" / ns
+
+def current_version(ns: str) -> Optional[str]:
+    p = ns_dir(ns) / CURRENT_FILE
+    return p.read_text(encoding="utf-8").strip() if p.exists() else None
+
+def current_dir(ns: str) -> Path:
+    """Directory holding the live index files (legacy flat layout when there is no CURRENT)."""
+    version = current_version(ns)
+    return ns_dir(ns) / version if version else ns_dir(ns)
+
+def article_hash(art: Dict) -> str:
+    """Content hash of a rule-pack article (all fields, order-independent)."""
+    return hashlib.sha1(json.dumps(art, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def write_version(ns: str, index: faiss.Index, cfg: IndexConfig, mapping: List[Optional[Dict]]) -> Path:
+    """Write a new version directory, then atomically point CURRENT at it."""
+    root = ns_dir(ns)
+    root.mkdir(parents=True, exist_ok=True)
+    version = "v" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    tmp = root / f".{version}.tmp"
+    tmp.mkdir()
+    faiss.write_index(index, str(tmp / "articles.index"))
+    write_meta(tmp, index, cfg)
+    write_article_store(tmp / STORE_FILE, mapping)
+    write_lexical_index(tmp / LEXICAL_FILE,
+                        [f"{r.get('title', '')}\n\n{r.get('text', '')}" if r else "" for r in mapping])
+    os.replace(tmp, root / version)
+
+    pointer = root / f".{CURRENT_FILE}.tmp"
+    pointer.write_text(version, encoding="utf-8")
+    os.replace(pointer, root / CURRENT_FILE)
+    _prune(root)
+    return root / version
+
+def _prune(root: Path):
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith("v"))
+    for old in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
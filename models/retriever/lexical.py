@@ -0,0 +1,110 @@
+"""
+BM25 inverted index stored next to articles.index (lexical.npz).
+- Tokens: lowercased word runs, keeping compounds like "paid-up" / "4.2" and
+  also emitting their parts, so "paid-up capital" matches "paid up capital"
+- Postings in CSR form: terms, indptr[V+1], doc_ids[int32], weights[float32]
+- BM25 term weights (impacts) are precomputed at build time, so a query is
+  one gather + one bincount over the matching postings, no Python per-doc loop
+Row ids are the faiss ids; removed rows are indexed as empty documents.
+"""
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+import re
+import numpy as np
+
+LEXICAL_FILE = "lexical.npz"
+K1 = 1.2
+B = 0.75
+MAX_QUERY_TERMS = 64
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+_PARTS = re.compile(r"[.\-/]")
+
+def tokenize(text: str) -> List[str]:
+    out = []
+    for tok in _TOKEN.findall((text or "").lower()):
+        out.append(tok)
+        if _PARTS.search(tok):
+            out.extend(p for p in _PARTS.split(tok) if p)
+    return out
+
+def build_lexical_index(texts: Sequence[str], k1: float = K1, b: float = B) -> Dict[str, np.ndarray]:
+    """CSR postings with BM25 impact weights for `texts` (row i == faiss id i)."""
+    n_docs = len(texts)
+    term_id: Dict[str, int] = {}
+    rows, cols, tfs = [], [], []
+    doc_len = np.zeros(n_docs, dtype=np.float32)
+    for i, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doc_len[i] = sum(counts.values())
+        for term, n in counts.items():
+            rows.append(i)
+            cols.append(term_id.setdefault(term, len(term_id)))
+            tfs.append(n)
+    rows = np.asarray(rows, dtype=np.int32)
+    cols = np.asarray(cols, dtype=np.int64)
+    tf = np.asarray(tfs, dtype=np.float32)
+    vocab = list(term_id)
+
+    # postings grouped by term, docs ascending within a term
+    order = np.lexsort((rows, cols))
+    rows, cols, tf = rows[order], cols[order], tf[order]
+    df = np.bincount(cols, minlength=len(vocab)).astype(np.float32)
+    live = doc_len > 0
+    n_live = max(1, int(live.sum()))
+    idf = np.log1p((n_live - df + 0.5) / (df + 0.5))
+    avgdl = float(doc_len[live].mean()) if live.any() else 1.0
+    norm = k1 * (1 - b + b * doc_len[rows] / avgdl)
+    weights = (idf[cols] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cols, minlength=len(vocab)), out=indptr[1:])
+    return {"terms": np.asarray(vocab, dtype=str), "indptr": indptr, "doc_ids": rows,
+            "weights": weights, "n_docs": np.asarray(n_docs)}
+
+def write_lexical_index(path: Path, texts: Sequence[str]):
+    np.savez(path, **build_lexical_index(texts))
+
+class LexicalIndex:
+    def __init__(self, path: Path):
+        with np.load(path) as z:
+            terms = z["terms"]
+            self.indptr, self.doc_ids, self.weights = z["indptr"], z["doc_ids"], z["weights"]
+            self.n_docs = int(z["n_docs"])
+        self.term_id = {t: j for j, t in enumerate(terms.tolist())}
+        self.nbytes = self.indptr.nbytes + self.doc_ids.nbytes + self.weights.nbytes + 64 * len(self.term_id)
+
+    def scores(self, text: str) -> np.ndarray:
+        """
+        BM25 score of every row for one query (query term frequency ignored).
+        Whole uploaded documents are queries too, so only the MAX_QUERY_TERMS rarest
+        terms are scored: they carry most of the BM25 mass and bound the postings read.
+        """
+        ids = np.fromiter({self.term_id[t] for t in tokenize(text) if t in self.term_id}, dtype=np.int64)
+        if not len(ids):
+            return np.zeros(self.n_docs, dtype=np.float32)
+        starts, lens = self.indptr[ids], self.indptr[ids + 1] - self.indptr[ids]
+        if len(ids) > MAX_QUERY_TERMS:
+            keep = np.argsort(lens, kind="stable")[:MAX_QUERY_TERMS]
+            starts, lens = starts[keep], lens[keep]
+        # concatenated posting ranges without a per-term Python loop
+        sel = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(lens.sum())
+        return np.bincount(self.doc_ids[sel], weights=self.weights[sel], minlength=self.n_docs).astype(np.float32)
+
+    def search(self, text: str, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, row ids) with positive score, best first."""
+        s = self.scores(text)
+        k = min(k, int((s > 0).sum()))
+        if k == 0:
+            return np.zeros(0, np.float32), np.zeros(0, np.int64)
+        top = np.argpartition(-s, k - 1)[:k]
+        top = top[np.argsort(-s[top], kind="stable")]
+        return s[top], top.astype(np.int64)
+
+def rrf_fuse(rankings: List[np.ndarray], k: int, c: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """Reciprocal rank fusion of ranked row-id lists (-1 entries ignored) → (scores, ids), best first."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, i in enumerate(int(x) for x in ranking if x >= 0):
+            fused[i] = fused.get(i, 0.0) + 1.0 / (c + rank + 1)
+    best = sorted(fused.items(), key=lambda kv: -kv[1])[:k]
+    return np.asarray([s for _, s in best], dtype=np.float32), np.asarray([i for i, _ in best], dtype=np.int64)
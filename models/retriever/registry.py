@@ -0,0 +1,73 @@
+"""
+Process-wide cache of regulator searchers.
+- One SentenceTransformer shared by every namespace (loaded once)
+- Per-namespace FAISS index + article store kept in an LRU, evicted once their
+  combined size exceeds `max_mb` (the most recent namespace always stays)
+- Thread-safe: concurrent requests for different namespaces never mutate
+  shared state; a namespace is loaded once even if requested concurrently
+- Hot-swap: when build_index publishes a new version of a namespace, the next
+  request loads it; in-flight searches finish on the old one
+"""
+from collections import OrderedDict
+import threading
+from typing import Dict, List, Optional
+from sentence_transformers import SentenceTransformer
+from models.config.defaults import SEARCHER_CACHE_MB
+from models.retriever.search import RegulatorSearcher, load_encoder
+
+class SearcherRegistry:
+    def __init__(self, max_mb: int = SEARCHER_CACHE_MB, model: Optional[SentenceTransformer] = None):
+        self.max_bytes = max_mb * 2**20
+        self._model = model
+        self._searchers: "OrderedDict[str, RegulatorSearcher]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Lock] = {}
+
+    @property
+    def model(self) -> SentenceTransformer:
+        with self._lock:
+            if self._model is None:
+                self._model = load_encoder()
+            return self._model
+
+    def get(self, ns: str) -> RegulatorSearcher:
+        ns = ns.lower()
+        with self._lock:
+            searcher = self._searchers.get(ns)
+            if searcher is not None and not searcher.is_stale():
+                self._searchers.move_to_end(ns)
+                return searcher
+            load_lock = self._loading.setdefault(ns, threading.Lock())
+
+        # load outside the registry lock so hits on other namespaces are not blocked
+        with load_lock:
+            with self._lock:
+                current = self._searchers.get(ns)
+                if current is not None and not current.is_stale():
+                    self._searchers.move_to_end(ns)
+                    return current
+            searcher = RegulatorSearcher(ns, model=self.model)
+            with self._lock:
+                self._searchers[ns] = searcher
+                self._searchers.move_to_end(ns)
+                self._loading.pop(ns, None)
+                self._evict()
+            print(f"[retriever] loaded ns={ns} ({searcher.nbytes / 2**20:.1f} MB, cached: {list(self._searchers)})")
+            return searcher
+
+    def _evict(self):
+        while len(self._searchers) > 1 and self.nbytes > self.max_bytes:
+            ns, _ = self._searchers.popitem(last=False)
+            print(f"[retriever] evicted ns={ns}")
+
+    @property
+    def nbytes(self) -> int:
+        return sum(s.nbytes for s in self._searchers.values())
+
+    def evict(self, ns: str):
+        """Drop a namespace (e.g. after its index was rebuilt); the next request reloads it."""
+        with self._lock:
+            self._searchers.pop(ns.lower(), None)
+
+    def search_batch(self, ns: str, texts: List[str], k: int = 5, mode: Optional[str] = None):
+        return self.get(ns).search_batch(texts, k=k, mode=mode)
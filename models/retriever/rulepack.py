@@ -0,0 +1,103 @@
+"""
+Rule-pack (and other YAML config) loading with a compiled binary cache.
+- Parses with the libyaml C loader when PyYAML was built with it (CSafeLoader)
+- Compiles each source into a pickle under RULEPACK_CACHE_DIR, stamped with the
+  source's mtime, size and sha1:
+    mtime+size unchanged → cache used without reading the source
+    touched but same sha1 → cache used, stamp refreshed
+    content changed       → re-parsed, cache rewritten atomically
+- generate_rulepacks writes the cache directly after dumping the YAML
+
+Run (precompile, e.g. at deploy time):
+  python -m models.retriever.rulepack --all
+"""
+import argparse
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Optional
+import yaml
+from models.config.defaults import ROOT_DIR, RULEPACK_CACHE_DIR
+
+CACHE_VERSION = 1
+RULEPACKS_DIR = ROOT_DIR / "config" / "regulators"
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+def rulepack_path(ns: str) -> Path:
+    return RULEPACKS_DIR / f"{ns}.yaml"
+
+def _cache_path(src: Path) -> Path:
+    # one cache file per source; the path digest keeps same-named files apart
+    digest = hashlib.sha1(str(src.resolve()).encode("utf-8")).hexdigest()[:10]
+    return RULEPACK_CACHE_DIR / f"{src.stem}.{digest}.pkl"
+
+def _stamp(src: Path, sha1: Optional[str] = None) -> Dict[str, Any]:
+    st = src.stat()
+    return {"version": CACHE_VERSION, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+            "sha1": sha1 or hashlib.sha1(src.read_bytes()).hexdigest()}
+
+def _write_cache(src: Path, stamp: Dict[str, Any], data: Any):
+    out = _cache_path(src)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        pickle.dump({**stamp, "data": data}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+
+def _read_cache(src: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_path(src), "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    return cached if cached.get("version") == CACHE_VERSION else None
+
+def load_yaml_cached(src: Path) -> Any:
+    """Parsed YAML of `src`, served from the compiled cache whenever the source is unchanged."""
+    src = Path(src)
+    if not src.exists():
+        raise FileNotFoundError(f"YAML not found: {src}")
+    st = src.stat()
+    cached = _read_cache(src)
+    if cached and cached["mtime_ns"] == st.st_mtime_ns and cached["size"] == st.st_size:
+        return cached["data"]
+
+    raw = src.read_bytes()
+    sha1 = hashlib.sha1(raw).hexdigest()
+    if cached and cached["sha1"] == sha1:
+        _write_cache(src, _stamp(src, sha1), cached["data"])
+        return cached["data"]
+
+    data = yaml.load(raw.decode("utf-8"), Loader=SafeLoader)
+    _write_cache(src, _stamp(src, sha1), data)
+    return data
+
+def load_rulepack(ns: str) -> Dict[str, Any]:
+    p = rulepack_path(ns)
+    if not p.exists():
+        raise FileNotFoundError(f"Rule-pack not found: {p}")
+    return load_yaml_cached(p)
+
+def write_rulepack(ns: str, rulepack: Dict[str, Any]) -> Path:
+    """Dump a rule-pack with the C emitter and compile its cache in the same step."""
+    p = rulepack_path(ns)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, "w", encoding="utf-8") as f:
+        yaml.dump(rulepack, f, Dumper=SafeDumper, allow_unicode=True, sort_keys=False)
+    _write_cache(p, _stamp(p), rulepack)
+    return p
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ns", action="append", help="namespace to compile (repeatable)")
+    ap.add_argument("--all", action="store_true", help="compile every config/regulators/*.yaml")
+    args = ap.parse_args()
+    names = [p.stem for p in sorted(RULEPACKS_DIR.glob("*.yaml"))] if args.all else (args.ns or [])
+    for ns in names:
+        rp = load_rulepack(ns)
+        print(f"[rulepack] ns={ns} articles={len(rp.get('articles', []))} → {_cache_path(rulepack_path(ns))}")
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,191 @@
 """
 Runtime search against a regulator's FAISS index.
-- Loads FAISS and article mapping.
-- Encodes a query (document snippet) and returns top-k article hits.
+- Loads FAISS and the article store (search knobs from index_meta.json) from the
+  live version of indices/<ns>/; is_stale() tells when an update has replaced it.
+- Encodes a query (document snippet) and returns top-k article hits
+  (mode="hybrid": dense + BM25 fused with reciprocal rank fusion;
+  mode="multi": one vector per query chunk, scores aggregated per article).
+- The encoder can be shared across namespaces (see models/retriever/registry.py)
+  and is cached on disk per text (see models/retriever/embedding_cache.py).
 """
-from typing import List, Dict
-from pathlib import Path
-import json
+from typing import List, Dict, Optional
 import faiss
 import numpy as np
 from sentence_transformers import SentenceTransformer
-from models.config.defaults import ROOT_DIR, MODEL_OUT_DIR, DEVICE
+from models.config.defaults import (
+    MODEL_OUT_DIR, DEVICE, EMBED_CACHE, EMBED_CACHE_QUERIES, RETRIEVAL_MODE, HYBRID_CANDIDATES,
+    QUERY_AGGREGATION, QUERY_TOP_M, QUERY_MAX_CHUNKS,
+)
+from models.preprocessing.chunking import chunk_texts
+from models.retriever.embedding_cache import EmbeddingCache, CachedEncoder, model_fingerprint
+from models.retriever.index_store import ns_dir, current_version
+from models.retriever.faiss_index import read_meta, configure_search
+from models.retriever.article_store import open_article_store
+from models.retriever.lexical import LEXICAL_FILE, LexicalIndex, rrf_fuse
+
+def load_encoder(cache: bool = EMBED_CACHE):
+    """Retriever encoder, behind the persistent embedding cache unless disabled (AIX_EMBED_CACHE=0)."""
+    model_dir = MODEL_OUT_DIR / "retriever"
+    model = SentenceTransformer(str(model_dir), device=DEVICE)
+    if not cache:
+        return model
+    emb_cache = EmbeddingCache(model_fingerprint(model_dir), model.get_sentence_embedding_dimension())
+    return CachedEncoder(model, emb_cache)
+
+def encode_queries(model, texts: List[str]) -> np.ndarray:
+    """Query embeddings; one-off query texts skip the embedding cache unless AIX_EMBED_CACHE_QUERIES=1."""
+    if isinstance(model, CachedEncoder):
+        return model.encode(texts, batch_size=32, normalize_embeddings=True, use_cache=EMBED_CACHE_QUERIES)
+    return model.encode(texts, batch_size=32, normalize_embeddings=True)
+
+def _cap(chunks: List[Dict], max_chunks: int) -> List[Dict]:
+    """At most `max_chunks` query chunks, evenly spread over the document."""
+    if len(chunks) <= max_chunks:
+        return chunks
+    keep = np.unique(np.linspace(0, len(chunks) - 1, max_chunks).round().astype(int))
+    return [chunks[i] for i in keep]
 
 class RegulatorSearcher:
-    def __init__(self, ns: str):
+    def __init__(self, ns: str, model: Optional[SentenceTransformer] = None):
         self.ns = ns
-        self.idx_dir = ROOT_DIR / "indices" / ns
-        self.mapping = json.loads((self.idx_dir / "mapping.json").read_text(encoding="utf-8"))
+        self.version = current_version(ns)  # read CURRENT once so dir and version agree
+        self.idx_dir = ns_dir(ns) / self.version if self.version else ns_dir(ns)
+        # article fields: memory-mapped Arrow store, read lazily per hit (legacy: mapping.json)
+        self.store = open_article_store(self.idx_dir)
         self.index = faiss.read_index(str(self.idx_dir / "articles.index"))
-        self.model = SentenceTransformer(str(MODEL_OUT_DIR / "retriever"), device=DEVICE)
+        # approximate indices: restore nprobe / efSearch recorded at build time
+        self.index_config = read_meta(self.idx_dir)
+        configure_search(self.index, self.index_config)
+        self.model = model or load_encoder()
+
+        # chunk-level indices (build_index --chunked) hold several rows per article
+        self.chunked = self.store.chunked
+        # BM25 postings for hybrid mode (absent on indices built before it existed → dense only)
+        lex_path = self.idx_dir / LEXICAL_FILE
+        self.lexical = LexicalIndex(lex_path) if lex_path.exists() else None
+        # approximate resident size of index + article fields (encoder excluded), used for cache eviction
+        self.nbytes = (self.idx_dir / "articles.index").stat().st_size + self.store.resident_bytes
+        if self.lexical is not None:
+            self.nbytes += self.lexical.nbytes
+
+    def is_stale(self) -> bool:
+        """True once build_index has switched indices/<ns>/CURRENT to a newer version."""
+        return current_version(self.ns) != self.version
+
+    def search_batch(self, texts: List[str], k: int = 5, mode: Optional[str] = None) -> List[List[Dict]]:
+        """
+        Top-k hits for each text, with one batched encode and one FAISS search.
+        mode="hybrid" also ranks rows with BM25 and fuses both lists by reciprocal rank;
+        mode="multi" searches with one vector per query chunk (search_multi_batch).
+        """
+        mode = mode or RETRIEVAL_MODE
+        if mode == "multi":
+            return self.search_multi_batch(texts, k=k)
+        hybrid = mode == "hybrid" and self.lexical is not None
+        q = encode_queries(self.model, texts).astype("float32")
+        # over-fetch on chunk indices so k distinct articles survive de-duplication
+        depth = k * 4 if self.chunked else k
+        if hybrid:
+            depth = max(depth, HYBRID_CANDIDATES)
+        scores, idx = self.index.search(q, depth)
+        if not hybrid:
+            return [self._hits(idx_row, score_row, k) for idx_row, score_row in zip(idx, scores)]
+        out = []
+        for text, idx_row in zip(texts, idx):
+            _, lex_row = self.lexical.search(text, depth)
+            fused_scores, fused_idx = rrf_fuse([idx_row, lex_row], depth)
+            out.append(self._hits(fused_idx, fused_scores, k))
+        return out
+
+    def search(self, text: str, k: int = 5, mode: Optional[str] = None) -> List[Dict]:
+        return self.search_batch([text], k=k, mode=mode)[0]
+
+    def search_multi_batch(self, texts: List[str], k: int = 5, aggregate: str = QUERY_AGGREGATION,
+                           top_m: int = QUERY_TOP_M, max_chunks: int = QUERY_MAX_CHUNKS) -> List[List[Dict]]:
+        """
+        Multi-vector search for long query documents: each text is split into token
+        chunks, all chunks of all texts are encoded in one call and searched in one
+        FAISS call, then scores are aggregated per article:
+          aggregate="max":  best chunk-to-row similarity (max-sim)
+          aggregate="topm": sum of the `top_m` best query-chunk similarities
+        Each hit carries the query chunk and article row that matched best ("evidence").
+        """
+        if aggregate not in ("max", "topm"):
+            raise ValueError(f"Unknown aggregation: {aggregate}")
+        chunks = [_cap(c, max_chunks) for c in chunk_texts(texts, self.model.tokenizer)]
+        q_texts = [c["text"] for cs in chunks for c in cs]
+        q_doc = np.repeat(np.arange(len(texts)), [len(cs) for cs in chunks])
+        if not q_texts:
+            return [[] for _ in texts]
+        q = encode_queries(self.model, q_texts).astype("float32")
+        depth = k * 4 if self.chunked else k
+        scores, idx = self.index.search(q, depth)
+
+        # flatten (query chunk, hit) pairs and map hit rows to article codes
+        q_chunk = np.repeat(np.arange(len(q_texts)), depth)
+        rows, sc = idx.ravel(), scores.ravel()
+        codes = self.store.article_codes()
+        valid = rows >= 0
+        q_chunk, rows, sc = q_chunk[valid], rows[valid], sc[valid]
+        art = codes[rows]
+        n_art = int(codes.max()) + 1 if len(codes) else 1
+
+        # best row per (query chunk, article): sort by key then score desc, keep first of each run
+        order = np.lexsort((-sc, q_chunk * n_art + art))
+        q_chunk, rows, sc, art = q_chunk[order], rows[order], sc[order], art[order]
+        first = np.r_[True, np.diff(q_chunk * n_art + art) != 0]
+        q_chunk, rows, sc, art = q_chunk[first], rows[first], sc[first], art[first]
+
+        # per (document, article): rank query chunks by score, aggregate the top ones
+        doc = q_doc[q_chunk]
+        key = doc * n_art + art
+        order = np.lexsort((-sc, key))
+        q_chunk, rows, sc, key = q_chunk[order], rows[order], sc[order], key[order]
+        starts = np.r_[True, np.diff(key) != 0]
+        group = np.cumsum(starts) - 1
+        rank = np.arange(len(key)) - np.flatnonzero(starts)[group]
+        m = 1 if aggregate == "max" else top_m
+        agg = np.bincount(group, weights=np.where(rank < m, sc, 0.0))
+        lead = np.flatnonzero(starts)  # best (query chunk, row) of each group = its evidence
+        g_doc = key[lead] // n_art
 
-    def search(self, text: str, k: int = 5) -> List[Dict]:
-        q = self.model.encode([text], normalize_embeddings=True).astype("float32")
-        scores, idx = self.index.search(q, k)
         out = []
-        for rank, (i, s) in enumerate(zip(idx[0], scores[0]), start=1):
-            art = self.mapping[i]
+        q_offsets = np.r_[0, np.cumsum([len(cs) for cs in chunks])]
+        for d in range(len(texts)):
+            gs = np.flatnonzero(g_doc == d)
+            gs = gs[np.argsort(-agg[gs], kind="stable")]
+            # _hits skips removed rows / repeated articles: pair evidence with the rows it kept
+            hits, kept = self._hits(rows[lead[gs]], agg[gs], k, with_positions=True)
+            for h, g in zip(hits, gs[kept]):
+                c = chunks[d][q_chunk[lead[g]] - q_offsets[d]]
+                h["evidence"] = {"query_char_start": c["char_start"], "query_char_end": c["char_end"],
+                                 "query_text": c["text"][:1000], "similarity": float(sc[lead[g]])}
+            out.append(hits)
+        return out
+
+    def _hits(self, idx_row, score_row, k: int, with_positions: bool = False):
+        """Up to k hits from ranked rows; with_positions also returns the index in idx_row of each hit."""
+        out, seen, positions = [], set(), []
+        for pos, (i, s) in enumerate(zip(idx_row, score_row)):
+            if len(out) == k:
+                break
+            if i < 0:
+                continue
+            art = self.store.get(int(i))
+            if art is None:
+                continue
+            if self.chunked:
+                if art["article_id"] in seen:
+                    continue
+                seen.add(art["article_id"])
             out.append({
-                "rank": rank,
+                "rank": len(out) + 1,
                 "score": float(s),
-                "article_id": art.get("article_id"),
-                "title": art.get("title"),
-                "domain": art.get("domain"),
-                "confidence": art.get("confidence", None),
-                "text": art.get("text")[:4000]
+                "article_id": art["article_id"],
+                "title": art["title"],
+                "domain": art["domain"],
+                "confidence": art["confidence"],
+                "text": self.store.get(int(i), fields=(), text_chars=4000)["text"],
             })
-        return out
+            positions.append(pos)
+        return (out, np.asarray(positions, dtype=np.int64)) if with_positions else out
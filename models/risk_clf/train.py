@@ -1,14 +1,22 @@
 """
 Train risk classifier with visible tqdm progress.
 """
-from transformers import AutoModelForSequenceClassification, Trainer
+import argparse
+from transformers import AutoModelForSequenceClassification, DataCollatorWithPadding
 from models.preprocessing.datasets import load_splits, tokenize_for_risk
-from models.training.utils import build_training_args, seed_everything
+from models.training.utils import build_training_args, seed_everything, BATCHING_MODES
+from models.training.sampling import BucketedTrainer
 from models.training.callbacks import TqdmLogger
 from models.evaluation.metrics import compute_risk_metrics
-from models.config.defaults import RISK_BACKBONE, NUM_RISK_LABELS, MODEL_OUT_DIR
+from models.config.defaults import RISK_BACKBONE, NUM_RISK_LABELS, MODEL_OUT_DIR, MAX_TOKENS_PER_BATCH
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batching", choices=BATCHING_MODES, default="default",
+                    help="default: fixed batches | length: length-grouped | tokens: token-budget batches")
+    ap.add_argument("--max-tokens", type=int, default=MAX_TOKENS_PER_BATCH)
+    cli = ap.parse_args()
+
     seed_everything(42)
     dd = load_splits()
     tokenized, tok = tokenize_for_risk(dd)
@@ -17,15 +25,17 @@ def main():
         RISK_BACKBONE, num_labels=NUM_RISK_LABELS
     )
 
-    args = build_training_args("risk_clf")
-    trainer = Trainer(
+    args = build_training_args("risk_clf", batching=cli.batching)
+    trainer = BucketedTrainer(
         model=model,
         args=args,
         train_dataset=tokenized.get("train"),
         eval_dataset=tokenized.get("validation"),
         tokenizer=tok,
+        data_collator=DataCollatorWithPadding(tok),  # pad to the longest example in each batch
         compute_metrics=compute_risk_metrics,
         callbacks=[TqdmLogger()],  # <-- progress bar callback
+        max_tokens_per_batch=cli.max_tokens if cli.batching == "tokens" else None,
     )
     trainer.train()
     out = MODEL_OUT_DIR / "risk_clf"
@@ -0,0 +1 @@
+"""Scoring: readiness, final risk label and ranked gaps from config/scoring.yml."""
@@ -0,0 +1,289 @@
+"""
+Scoring engine for config/scoring.yml: readiness (0..100), final risk label and
+ranked gaps for a batch of documents and their retrieval hits.
+- The YAML is read through the compiled cache (models/retriever/rulepack.py) and
+  compiled once into arrays: domain weights + critical flags, risk cut points,
+  normalization range, ranking key
+- A batch is scored as flat (document, hit) arrays: per-document sums are one
+  bincount, the top-N gaps of every document one lexsort; Python only builds
+  the output dicts
+Per hit (a retrieved article the document has to satisfy):
+  relevance = hit score / best hit score of its document (clipped at 0)
+  risk weight = risk_floor + (1 - risk_floor) × document risk score
+  deficit   = risk weight × article confidence × relevance
+  impact    = domain weight × deficit × impact_scale
+Document:
+  gap       = Σ impact;  readiness = 100 × (1 - min(gap, max_gap) / max_gap)
+  critical breach = a hit in a critical domain with deficit >= severe_deficit
+                    → readiness capped at caps.critical_breach_max_readiness
+A low-risk document thus keeps risk_floor of its gaps instead of none. The risk
+score is the expected severity of the risk head, mapped to a RISK_LABELS label with
+the thresholds (or calibrated quantile cut points, see calibrate()): each threshold
+is the lower bound of its label, and scores under every cut point get the lowest
+label. Severity is
+looked up by label name: risk_labeling.severity if given, else the rank of the
+label among the risk_labeling.thresholds keys spread over 0..1 (low 0, medium 0.5,
+high 1), whatever order id2label.json lists them in.
+
+Calibration (scheme: quantiles / normalize.mode: empirical) from the validation split:
+  python -m models.scoring.engine --ns qcb [--split validation] [--limit 2000]
+"""
+from pathlib import Path
+import argparse
+from typing import Any, Dict, List, Optional, Sequence
+import json
+import numpy as np
+from models.config.defaults import RISK_LABELS, SCORING_CONFIG, SCORING_CALIBRATION
+from models.retriever.rulepack import load_yaml_cached
+
+IMPACT_SCALE = 10.0     # impact points per unit of weight × deficit (readiness.impact_scale)
+RISK_FLOOR = 0.5        # share of a gap kept at risk score 0 (readiness.risk_floor)
+SEVERE_DEFICIT = 0.5    # deficit that counts as a severe violation (readiness.caps.severe_deficit)
+SORT_KEYS = ("impact", "confidence", "weight")
+
+class _Blank(dict):
+    def __missing__(self, key):
+        return ""
+
+def risk_severity(rl: Dict[str, Any], labels: Sequence[str]) -> np.ndarray:
+    """Severity (0..1) of each risk label, by name; ValueError for a label with none."""
+    sev = rl.get("severity")
+    if not sev:
+        ref = rl.get("thresholds") or rl.get("quantiles") or {}
+        order = sorted(ref, key=lambda name: ref[name])
+        sev = {name: i / max(len(order) - 1, 1) for i, name in enumerate(order)}
+    unknown = [l for l in labels if l not in sev]
+    if unknown:
+        raise ValueError(f"Risk labels {unknown} have no severity; add them to "
+                         f"risk_labeling.thresholds or risk_labeling.severity in the scoring config")
+    return np.asarray([float(sev[l]) for l in labels], dtype=np.float64)
+
+class ScoringEngine:
+    def __init__(self, cfg: Dict[str, Any], calibration: Optional[Dict[str, Any]] = None):
+        cfg = cfg or {}
+        calibration = calibration or {}
+        # domains: static table, unknown domains weighted on the fly (dynamic_domains)
+        domains = cfg.get("domains") or {}
+        self.known = {name: (float(d.get("weight", 1.0)), bool(d.get("critical", False)))
+                      for name, d in domains.items()}
+        dyn = cfg.get("dynamic_domains") or {}
+        self.dynamic = bool(dyn.get("enabled", True))
+        self.fallback_weight = float(dyn.get("fallback_weight", 2.5))
+        self.min_weight = float(dyn.get("min_weight", 1.0))
+        self.max_weight = float(dyn.get("max_weight", 6.0))
+        self.size_bias = float(dyn.get("size_bias", 0.0))
+
+        # risk labels: ascending cut points, each the lower bound of its label
+        rl = cfg.get("risk_labeling") or {}
+        cuts = rl.get("thresholds") or {}
+        if rl.get("scheme") == "quantiles":
+            if calibration.get("risk_cuts"):
+                cuts = calibration["risk_cuts"]
+            else:
+                print("[scoring] scheme=quantiles but no calibrated cut points; using thresholds")
+        order = sorted(cuts, key=lambda name: cuts[name])
+        unknown = [name for name in order if name not in RISK_LABELS]
+        if unknown or not order:
+            raise ValueError(f"risk_labeling cut points {order} must name risk labels {list(RISK_LABELS)}")
+        self.cuts = np.asarray([float(cuts[name]) for name in order], dtype=np.float64)
+        self.cut_labels = np.asarray([order[0]] + order, dtype=object)  # below every cut → lowest label
+        self.severity = risk_severity(rl, RISK_LABELS)
+
+        # readiness
+        rd = cfg.get("readiness") or {}
+        norm = rd.get("normalize") or {}
+        self.max_gap = float(norm.get("fixed_max_gap", 100.0))
+        if norm.get("mode") == "empirical":
+            if calibration.get("max_gap"):
+                self.max_gap = float(calibration["max_gap"])
+            else:
+                print("[scoring] normalize=empirical but no calibrated max gap; using fixed_max_gap")
+        caps = rd.get("caps") or {}
+        self.breach_cap = float(caps.get("critical_breach_max_readiness", 100.0))
+        self.severe_deficit = float(caps.get("severe_deficit", SEVERE_DEFICIT))
+        self.impact_scale = float(rd.get("impact_scale", IMPACT_SCALE))
+        self.risk_floor = min(max(float(rd.get("risk_floor", RISK_FLOOR)), 0.0), 1.0)
+
+        # gaps + templates
+        gp = cfg.get("gaps") or {}
+        self.top_n = int(gp.get("top_n", 10))
+        self.sort_by = gp.get("sort_by", "impact")
+        if self.sort_by not in SORT_KEYS:
+            raise ValueError(f"Unknown gaps.sort_by: {self.sort_by} (expected one of {SORT_KEYS})")
+        self.include_evidence = bool(gp.get("include_evidence", True))
+        self.evidence_chars = int(gp.get("evidence_chars", 240))
+        tpl = cfg.get("templates") or {}
+        self.gap_template = (tpl.get("gap_item") or "").strip()
+        self.summary_template = (tpl.get("summary") or "").strip()
+
+    def domain_table(self, names: Sequence[str], sizes: Optional[Dict[str, int]] = None):
+        """(weights, critical) arrays for `names`; unknown domains get the clamped fallback weight."""
+        sizes = sizes or {}
+        largest = max(sizes.values(), default=0) or 1
+        weights = np.empty(len(names), dtype=np.float64)
+        critical = np.zeros(len(names), dtype=bool)
+        for j, name in enumerate(names):
+            if name in self.known:
+                weights[j], critical[j] = self.known[name]
+            elif self.dynamic:
+                boost = 1.0 + self.size_bias * sizes.get(name, 0) / largest
+                weights[j] = min(max(self.fallback_weight * boost, self.min_weight), self.max_weight)
+            else:
+                weights[j] = 0.0  # unknown domains ignored
+        return weights, critical
+
+    def risk_scores(self, risk_probs: np.ndarray) -> np.ndarray:
+        """Expected severity (0..1) of each row of risk probabilities, in RISK_LABELS order."""
+        return np.asarray(risk_probs, dtype=np.float64).reshape(-1, len(self.severity)) @ self.severity
+
+    def risk_labels(self, risk: np.ndarray) -> np.ndarray:
+        return self.cut_labels[np.searchsorted(self.cuts, risk, side="right")]
+
+    def score_batch(self, risk_probs: np.ndarray, hits: List[List[Dict]],
+                    domain_sizes: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Readiness, risk label and top-N gaps for each document.
+        risk_probs: (n_docs, len(RISK_LABELS)); hits[i]: retrieval hits of document i, best first.
+        domain_sizes: articles per domain in the namespace (size bias of dynamic domains).
+        """
+        n = len(hits)
+        counts = np.fromiter((len(h) for h in hits), dtype=np.int64, count=n)
+        flat = [h for hs in hits for h in hs]
+        doc = np.repeat(np.arange(n), counts)
+        score = np.clip(np.asarray([h.get("score") for h in flat], dtype=np.float64), 0.0, None)
+        conf = np.asarray([h.get("confidence") for h in flat], dtype=np.float64)
+        conf = np.clip(np.nan_to_num(conf, nan=1.0), 0.0, 1.0)  # missing confidence → trusted
+        codes: Dict[str, int] = {}  # domain → dense code (a dict beats np.unique's string sort)
+        dcode = np.fromiter((codes.setdefault(h.get("domain") or "general", len(codes)) for h in flat),
+                            dtype=np.int64, count=len(flat))
+        weights, critical = self.domain_table(list(codes), domain_sizes)
+
+        risk = self.risk_scores(risk_probs)
+        best = np.zeros(n)
+        np.maximum.at(best, doc, score)
+        rel = score / np.where(best > 0, best, 1.0)[doc]
+        risk_weight = self.risk_floor + (1.0 - self.risk_floor) * risk
+        deficit = risk_weight[doc] * conf * rel
+        w, crit = weights[dcode], critical[dcode]
+        impact = w * deficit * self.impact_scale
+        breach = crit & (deficit >= self.severe_deficit)
+        is_gap = impact > 0
+
+        gap = np.bincount(doc, weights=impact, minlength=n)
+        critical_count = np.bincount(doc, weights=breach, minlength=n).astype(np.int64)
+        total_gaps = np.bincount(doc, weights=is_gap, minlength=n).astype(np.int64)
+        readiness = 100.0 * (1.0 - np.minimum(gap, self.max_gap) / self.max_gap)
+        readiness = np.where(critical_count > 0, np.minimum(readiness, self.breach_cap), readiness)
+        labels = self.risk_labels(risk)
+
+        # top-N gaps per document: sort by (doc, -key, -impact), keep the first top_n of each doc
+        key = {"impact": impact, "confidence": conf, "weight": w}[self.sort_by]
+        order = np.lexsort((-impact, -key, doc))
+        order = order[is_gap[order]]
+        d = doc[order]
+        rank = np.arange(len(order)) - np.searchsorted(d, d)
+        top = rank < self.top_n
+        keep = order[top]
+        bounds = np.searchsorted(doc[keep], np.arange(n + 1)).tolist()
+
+        # output dicts: values rounded/converted column-wise, then one comprehension over the kept gaps
+        kept = [flat[j] for j in keep.tolist()]
+        cols = zip(kept, (rank[top] + 1).tolist(), np.round(w[keep], 2).tolist(), crit[keep].tolist(),
+                   np.round(conf[keep], 4).tolist(), np.round(rel[keep], 4).tolist(), np.round(impact[keep], 2).tolist())
+        gap_rows = [{
+            "rank": rk,
+            "article_id": h.get("article_id"),
+            "title": h.get("title") or "",
+            "domain": h.get("domain") or "general",
+            "weight": wj, "critical": cj, "confidence": fj, "relevance": rj, "impact": ij,
+        } for h, rk, wj, cj, fj, rj, ij in cols]
+        if self.include_evidence:
+            for g, h in zip(gap_rows, kept):
+                ev = h.get("evidence")
+                g["evidence"] = (ev["query_text"] if ev else h.get("text") or "")[:self.evidence_chars]
+
+        labels = labels.tolist()
+        readiness, risk, gap = np.round(readiness, 1).tolist(), np.round(risk, 4).tolist(), np.round(gap, 4).tolist()
+        critical_count, total_gaps = critical_count.tolist(), total_gaps.tolist()
+        results = []
+        for i in range(n):
+            gaps = gap_rows[bounds[i]:bounds[i + 1]]
+            out = {
+                "readiness": readiness[i],
+                "risk_score": risk[i],
+                "risk_label": labels[i],
+                "gap_score": gap[i],
+                "critical_breach": critical_count[i] > 0,
+                "critical_count": critical_count[i],
+                "total_gaps": total_gaps[i],
+                "gaps": gaps,
+            }
+            next_steps = "; ".join(f"address {g['article_id']} ({g['domain']})" for g in gaps[:3]) or "none"
+            out["summary"] = self.summary_template.format_map(_Blank(out, next_steps=next_steps))
+            results.append(out)
+        return results
+
+    def explain(self, gap: Dict[str, Any], risk_label: str = "") -> str:
+        """templates.gap_item for one gap of score_batch (rendered on demand, not per batch)."""
+        why = (f"{'critical ' if gap['critical'] else ''}{gap['domain']} requirement, "
+               f"relevance {gap['relevance']:.2f}, document risk {risk_label or 'n/a'}")
+        fix = f"cover {gap['article_id']} ({gap['title']}) explicitly in the document"
+        return self.gap_template.format_map(_Blank(gap, domain_name=gap["domain"], why=why, fix=fix))
+
+def _read_calibration(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+def load_scoring_engine(path: Path = SCORING_CONFIG, calibration: Path = SCORING_CALIBRATION) -> ScoringEngine:
+    """Compiled engine for config/scoring.yml (+ calibrated cut points when present)."""
+    return ScoringEngine(load_yaml_cached(path), _read_calibration(Path(calibration)))
+
+def calibrate(results: List[Dict[str, Any]], path: Path = SCORING_CALIBRATION,
+              config: Path = SCORING_CONFIG) -> Dict[str, Any]:
+    """
+    Persist empirical normalization + quantile risk cut points from scored validation
+    documents (score_batch outputs), for normalize.mode=empirical / scheme=quantiles.
+    """
+    cfg = load_yaml_cached(config)
+    quantiles = ((cfg.get("risk_labeling") or {}).get("quantiles")
+                 or {"high": 0.80, "medium": 0.50, "low": 0.20})
+    risk = np.asarray([r["risk_score"] for r in results], dtype=np.float64)
+    gap = np.asarray([r["gap_score"] for r in results], dtype=np.float64)
+    out = {
+        "risk_cuts": {name: float(np.quantile(risk, q)) for name, q in quantiles.items()},
+        "max_gap": float(max(np.quantile(gap, 0.99), 1e-6)),
+        "n": len(results),
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(out, indent=2), encoding="utf-8")
+    print(f"[scoring] calibration ({len(results)} docs) → {path}")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Calibrate scoring (quantile risk cuts, empirical max gap) on a data split")
+    ap.add_argument("--ns", required=True, help="regulator namespace used for retrieval")
+    ap.add_argument("--split", default="validation", choices=["train", "validation", "test"])
+    ap.add_argument("--limit", type=int, default=0, help="score at most this many documents (0 = all)")
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--out", type=Path, default=SCORING_CALIBRATION)
+    args = ap.parse_args()
+
+    # heavy imports only for the CLI (predict imports this module)
+    from models.inference.predict import InferencePipeline
+    from models.preprocessing.datasets import load_splits
+    splits = load_splits()
+    if args.split not in splits:
+        raise SystemExit(f"No {args.split} split under data/datasets; run src/datasets/build_splits.py")
+    ds = splits[args.split]
+    if args.limit:
+        ds = ds.select(range(min(args.limit, len(ds))))
+    pipe = InferencePipeline(regulator_ns=args.ns.lower(), long_doc=True)
+    results = []
+    for i in range(0, len(ds), args.batch_size):
+        texts = ds[i:i + args.batch_size]["text"]
+        results.extend(r["score"] for r in pipe.run_batch(texts))
+    if not results:
+        raise SystemExit(f"{args.split} split is empty")
+    calibrate(results, args.out)
+
+if __name__ == "__main__":
+    main()
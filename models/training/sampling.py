@@ -0,0 +1,85 @@
+"""
+Length-aware batching for classifier training:
+- TokenBudgetBatchSampler: packs similar-length examples so that
+  batch_size * longest_example <= max_tokens (instead of a fixed batch size)
+- BucketedTrainer: HF Trainer that uses the sampler for the train dataloader
+Padding stays dynamic (DataCollatorWithPadding), so short snippets are no
+longer padded up to the 512-token business plans they would otherwise share a batch with.
+"""
+from typing import List, Optional, Sequence
+import numpy as np
+from torch.utils.data import DataLoader, Sampler
+from transformers import Trainer
+
+class TokenBudgetBatchSampler(Sampler):
+    """
+    Sorts examples by length (random tie-break per epoch), greedily packs them
+    into batches under a padded-token budget, then shuffles the batch order.
+
+    The batch count depends only on the multiset of lengths, so len() is stable
+    across epochs (the Trainer relies on it for step counting).
+    """
+    def __init__(self, lengths: Sequence[int], max_tokens: int, max_batch_size: Optional[int] = None,
+                 shuffle: bool = True, seed: int = 42):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.max_tokens = int(max_tokens)
+        self.max_batch_size = max_batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self._n_batches = len(self._batches(np.random.default_rng(seed)))
+
+    def _batches(self, rng) -> List[List[int]]:
+        tie_break = rng.random(len(self.lengths)) if self.shuffle else np.arange(len(self.lengths))
+        order = np.lexsort((tie_break, self.lengths))
+        batches, current, longest = [], [], 0
+        for idx in order:
+            length = int(self.lengths[idx])
+            new_longest = max(longest, length)
+            full = self.max_batch_size is not None and len(current) >= self.max_batch_size
+            if current and (full or new_longest * (len(current) + 1) > self.max_tokens):
+                batches.append(current)
+                current, new_longest = [], length
+            current.append(int(idx))
+            longest = new_longest
+        if current:
+            batches.append(current)
+        return batches
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+        batches = self._batches(rng)
+        if self.shuffle:
+            rng.shuffle(batches)
+        return iter(batches)
+
+    def __len__(self) -> int:
+        return self._n_batches
+
+
+class BucketedTrainer(Trainer):
+    """
+    Trainer whose train dataloader uses TokenBudgetBatchSampler when
+    `max_tokens_per_batch` is set; otherwise behaves exactly like Trainer
+    (use TrainingArguments.group_by_length for length-grouped fixed-size batches).
+    """
+    def __init__(self, *args, max_tokens_per_batch: Optional[int] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_tokens_per_batch = max_tokens_per_batch
+
+    def get_train_dataloader(self) -> DataLoader:
+        if not self.max_tokens_per_batch:
+            return super().get_train_dataloader()
+
+        train_dataset = self.train_dataset
+        lengths = train_dataset[self.args.length_column_name]
+        sampler = TokenBudgetBatchSampler(lengths, self.max_tokens_per_batch, seed=self.args.seed)
+        train_dataset = self._remove_unused_columns(train_dataset, description="training")
+        return self.accelerator.prepare(DataLoader(
+            train_dataset,
+            batch_sampler=sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        ))
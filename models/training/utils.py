@@ -2,6 +2,8 @@
 Shared training utilities:
 - seed_everything()
 - default TrainingArguments builder with tqdm enabled
+- batching modes: "default" (fixed batches), "length" (length-grouped),
+  "tokens" (token-budget batches, see models.training.sampling)
 """
 import random, numpy as np, torch
 from transformers import TrainingArguments
@@ -16,7 +18,9 @@ def seed_everything(seed: int = 42):
     torch.manual_seed(seed)
     torch.cuda.manual_seed_all(seed)
 
-def build_training_args(name: str) -> TrainingArguments:
+BATCHING_MODES = ("default", "length", "tokens")
+
+def build_training_args(name: str, batching: str = "default", label_names=None) -> TrainingArguments:
     out_dir = (MODEL_OUT_DIR / name)
     # out_dir.mkdir(parents=True, exist_ok=True)
     log_dir = (LOG_DIR / name)
@@ -39,5 +43,9 @@ def build_training_args(name: str) -> TrainingArguments:
         fp16=(DEVICE == "cuda"),
         report_to=["none"],          # add "tensorboard" if you want TB logs
         metric_for_best_model="f1",
+        # >>> batching <<<
+        group_by_length=(batching == "length"),
+        length_column_name="length",
+        label_names=label_names,     # e.g. both label columns for the multi-task model
     )
 
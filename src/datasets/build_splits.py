@@ -1,17 +1,21 @@
 """
 Build Arrow datasets for training (doc_type, risk).
-Reads input manifests (JSONL or JSON) from data/interim/startups/.
-Saves Arrow splits under data/datasets/{train,val,test}.
+Streams input manifests (JSONL, or legacy JSON arrays) from data/interim/startups/
+through Dataset.from_generator, so the corpus never has to fit in RAM.
+Each document's split comes from a salted hash of its doc_id alone, so it never
+changes between rebuilds; every (targets.doc_type, targets.risk) stratum is split
+in the SPLITS proportions in expectation. Saved as sharded Arrow under
+data/datasets/{train,val,test} (plus Parquet shards with --parquet).
 """
 from pathlib import Path
-import json, random
-from datasets import Dataset
+import argparse, hashlib, json
+from datasets import Dataset, Features, Value
 from tqdm.auto import tqdm
 
 # --- FIX START: Define the ROOT_DIR reliably ---
 
 # Find the project root by going up from the script's location (src/datasets)
-ROOT_DIR = Path(__file__).resolve().parents[2] 
+ROOT_DIR = Path(__file__).resolve().parents[2]
 # This script is at 'C:/src/datasets/build_splits.py'. parents[2] points to 'C:/' (the project root).
 
 # Define paths relative to the ROOT_DIR
@@ -20,33 +24,111 @@ OUTPUT_DATA_DIR = ROOT_DIR / "data" / "datasets"
 
 # --- FIX END ---
 
+# Share of the doc_id hash range [0, 1) that goes to each split
+SPLITS = [("train", 0.8), ("val", 0.1), ("test", 0.1)]
+# Changing the salt reshuffles every split; keep it fixed for reproducible reruns
+SPLIT_SALT = "aix-splits-v1"
+MAX_SHARD_SIZE = "500MB"
 
-def build_splits(src_dir: Path = INPUT_MANIFESTS_DIR):
+FEATURES = Features({
+    "doc_id": Value("string"),
+    "regulator_ns": Value("string"),
+    "path": Value("string"),
+    "text": Value("string"),
+    "targets": {"doc_type": Value("string"), "risk": Value("string")},
+    "meta": Value("string"),  # JSON-encoded; its keys vary between sources
+})
+
+
+def _manifest_paths(src_dir: Path):
+    """JSONL manifests plus legacy JSON-array manifests (ingestion state files excluded)."""
+    paths = sorted(src_dir.glob("*.jsonl")) + sorted(src_dir.glob("*.json"))
+    return [p for p in paths if not p.name.startswith("state.")]
+
+
+def _iter_rows(path: Path):
+    if path.suffix == ".jsonl":
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        # legacy format: one JSON array per file (cannot be streamed)
+        yield from json.loads(path.read_text(encoding="utf-8"))
+
+
+def _gen_manifest_rows(paths, stamps):
+    # `stamps` (size, mtime) is unused here; it only changes the generator's
+    # cache fingerprint when a manifest is rewritten under the same name
+    for p in tqdm(paths, desc="reading manifests", dynamic_ncols=True):
+        for row in _iter_rows(Path(p)):
+            targets = row.get("targets") or {}
+            yield {
+                "doc_id": str(row.get("doc_id", "")),
+                "regulator_ns": row.get("regulator_ns"),
+                "path": row.get("path"),
+                "text": row.get("text") or "",
+                "targets": {"doc_type": targets.get("doc_type"), "risk": targets.get("risk")},
+                "meta": json.dumps(row.get("meta") or {}, ensure_ascii=False),
+            }
+
+
+def _split_keys(batch):
+    """Salted doc_id hash in [0, 1) and the split it falls in, for each row."""
+    hashes = []
+    for doc_id in batch["doc_id"]:
+        digest = hashlib.sha1(f"{SPLIT_SALT}:{doc_id}".encode("utf-8")).hexdigest()
+        hashes.append(int(digest[:15], 16) / 16 ** 15)
+    return {"_h": hashes, "_split": [_assign_split(h) for h in hashes]}
+
+
+def _assign_split(fraction: float) -> str:
+    edge = 0.0
+    for name, share in SPLITS:
+        edge += share
+        if fraction < edge:
+            return name
+    return SPLITS[-1][0]
+
+
+def build_splits(src_dir: Path = INPUT_MANIFESTS_DIR, out_dir: Path = OUTPUT_DATA_DIR,
+                 parquet: bool = False, max_shard_size: str = MAX_SHARD_SIZE):
     # Ensure the output directory exists before saving
-    OUTPUT_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    
-    rows = []
-    # --- FIX: Use JSONL reading for memory efficiency (assuming you adopt this) ---
-    # for p in tqdm(sorted(src_dir.glob("*.jsonl")), desc="reading manifests", dynamic_ncols=True):
-    #     with p.open("r", encoding="utf-8") as f:
-    #         for line in f:
-    #             rows.append(json.loads(line))
-    for p in tqdm(sorted(src_dir.glob("*.json")), desc="reading manifests", dynamic_ncols=True):
-        rows += json.loads(p.read_text())
-
-    # shuffle with a visible step count (not necessary but explicit)
-    tqdm.write(f"[dataset] total rows before split: {len(rows)}")
-    random.shuffle(rows)
-    n = len(rows)
-    train, val, test = rows[:int(0.8*n)], rows[int(0.8*n):int(0.9*n)], rows[int(0.9*n):]
-
-    # --- FIX: Use Path objects for saving ---
-    Dataset.from_list(train).save_to_disk(str(OUTPUT_DATA_DIR / "train"))
-    Dataset.from_list(val).save_to_disk(str(OUTPUT_DATA_DIR / "val"))
-    Dataset.from_list(test).save_to_disk(str(OUTPUT_DATA_DIR / "test"))
-
-    print(f"[dataset] train={len(train)} val={len(val)} test={len(test)}")
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    paths = _manifest_paths(src_dir)
+    stamps = [(p.stat().st_size, p.stat().st_mtime_ns) for p in paths]
+    # written to an on-disk Arrow cache as it is generated → out-of-core from here on
+    ds = Dataset.from_generator(
+        _gen_manifest_rows, gen_kwargs={"paths": [str(p) for p in paths], "stamps": stamps}, features=FEATURES
+    )
+    tqdm.write(f"[dataset] total rows before split: {len(ds)}")
+
+    # Each doc_id's split depends only on its own hash, so adding or removing documents
+    # never moves existing ones between splits (no test → train leakage across rebuilds)
+    ds = ds.map(_split_keys, batched=True, desc="assigning splits")
+
+    sizes = {}
+    for name, _ in SPLITS:
+        part = ds.filter(lambda s: [x == name for x in s], input_columns="_split", batched=True)
+        # order by hash so doc_types / risks interleave; drop helper columns
+        part = part.sort("_h").remove_columns(["_h", "_split"])
+        part.save_to_disk(str(out_dir / name), max_shard_size=max_shard_size)
+        if parquet:
+            pq_dir = out_dir / "parquet" / name
+            pq_dir.mkdir(parents=True, exist_ok=True)
+            # one Parquet file per Arrow shard
+            n_shards = max(1, len(list((out_dir / name).glob("*.arrow"))))
+            for i in range(n_shards):
+                part.shard(n_shards, i, contiguous=True).to_parquet(str(pq_dir / f"{name}-{i:05d}.parquet"))
+        sizes[name] = len(part)
+
+    print("[dataset] " + " ".join(f"{k}={v}" for k, v in sizes.items()))
+
 
 if __name__ == "__main__":
-    # --- FIX: No need to pass an argument if the default is set globally ---
-    build_splits()
\ No newline at end of file
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--parquet", action="store_true", help="also write Parquet shards under data/datasets/parquet/")
+    ap.add_argument("--max-shard-size", default=MAX_SHARD_SIZE)
+    args = ap.parse_args()
+    build_splits(parquet=args.parquet, max_shard_size=args.max_shard_size)
@@ -0,0 +1,84 @@
+"""
+Chunking stage between ingestion and indexing.
+Reads the regulator_<ns> Arrow dataset written by ingest_regulatory_corpus,
+splits each extracted .txt into overlapping retriever-token chunks, and saves
+a chunk-level Arrow dataset under data/processed/chunks/<ns>/, which
+`build_index --chunked` indexes (joined to rule-pack articles by doc sha1).
+
+Run:
+  python -m src.ingest.chunk_corpus --ns qcb --num-proc 4
+"""
+from __future__ import annotations
+import argparse
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from datasets import Dataset, Features, Value, load_from_disk
+
+from models.config.defaults import DATA_DIR, CHUNKS_DIR, CHUNK_MAX_TOKENS, CHUNK_OVERLAP
+from models.preprocessing.chunking import chunk_texts, load_chunk_tokenizer
+
+DOCS_PER_BATCH = 16
+
+CHUNK_FEATURES = Features({
+    "chunk_id": Value("string"),      # "<doc sha1>:<chunk_index>"
+    "doc_sha1": Value("string"),
+    "ns": Value("string"),
+    "path": Value("string"),
+    "chunk_index": Value("int32"),
+    "char_start": Value("int64"),     # offsets into the source <sha1>.txt
+    "char_end": Value("int64"),
+    "n_tokens": Value("int32"),
+    "text": Value("string"),
+})
+
+
+def _gen_chunks(docs: List[Dict], max_tokens: int, overlap: int) -> Iterator[Dict]:
+    """Generator run in each worker over its shard of `docs` (batched tokenization)."""
+    tokenizer = load_chunk_tokenizer()
+    for i in range(0, len(docs), DOCS_PER_BATCH):
+        batch = docs[i:i + DOCS_PER_BATCH]
+        texts = [Path(d["txt_path"]).read_text(encoding="utf-8", errors="ignore") for d in batch]
+        for doc, chunks in zip(batch, chunk_texts(texts, tokenizer, max_tokens, overlap)):
+            for c in chunks:
+                yield {
+                    "chunk_id": f"{doc['sha1']}:{c['chunk_index']}",
+                    "doc_sha1": doc["sha1"],
+                    "ns": doc["ns"],
+                    "path": doc["path"],
+                    **c,
+                }
+
+
+def build_chunks(
+    ns: str,
+    num_proc: int = 1,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap: int = CHUNK_OVERLAP,
+) -> Path:
+    src = load_from_disk(str(DATA_DIR / f"regulator_{ns}"))
+    docs = src.select_columns(["ns", "path", "sha1", "txt_path"]).to_list()  # metadata only
+
+    # gen_kwargs lists are sharded across `num_proc` generator processes
+    ds = Dataset.from_generator(
+        _gen_chunks,
+        gen_kwargs={"docs": docs, "max_tokens": max_tokens, "overlap": overlap},
+        features=CHUNK_FEATURES,
+        num_proc=num_proc if num_proc > 1 and len(docs) > 1 else None,
+    )
+
+    out_dir = CHUNKS_DIR / ns
+    ds.save_to_disk(str(out_dir))
+    print(f"[chunks] ns={ns} docs={len(docs)} chunks={len(ds)} → {out_dir}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ns", required=True)
+    ap.add_argument("--num-proc", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--max-tokens", type=int, default=CHUNK_MAX_TOKENS)
+    ap.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    args = ap.parse_args()
+    build_chunks(args.ns.lower(), args.num_proc, args.max_tokens, args.overlap)
@@ -0,0 +1,178 @@
+"""
+Shared text extraction for ingestion (PDF via PyMuPDF, DOCX via python-docx).
+- Plain helpers: read_pdf_text_from_bytes / read_docx_text_from_bytes / extract_text_from_bytes
+- ExtractionEngine: spreads documents over a process pool and splits large PDFs
+  into page ranges; pieces come back in page order and can be streamed to a .txt
+- A large PDF is spilled to a temp file; it is removed once its job is consumed or
+  closed, and ExtractionEngine.close() closes jobs nobody consumed
+"""
+from __future__ import annotations
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from io import BytesIO
+from pathlib import Path
+from typing import List, Optional, Union
+
+import fitz  # PyMuPDF
+from docx import Document
+
+EXTRACT_WORKERS: int = int(os.environ.get("INGEST_EXTRACT_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK: int = int(os.environ.get("INGEST_PAGES_PER_TASK", "50"))
+
+
+def read_pdf_text_from_bytes(content: bytes) -> str:
+    """Extracts text from PDF bytes using PyMuPDF (fitz)."""
+    doc = fitz.open(stream=content, filetype="pdf")
+    return "\n".join(p.get_text("text") for p in doc)
+
+def read_docx_text_from_bytes(content: bytes) -> str:
+    """Extracts text from DOCX bytes using python-docx."""
+    doc = Document(BytesIO(content))
+    return "\n".join(p.text for p in doc.paragraphs)
+
+def extract_text_from_bytes(file_path: str, content: bytes) -> str:
+    """Routes text extraction based on file extension."""
+    suffix = Path(file_path).suffix.lower()
+    if suffix == ".pdf":
+        return read_pdf_text_from_bytes(content)
+    if suffix == ".docx":
+        return read_docx_text_from_bytes(content)
+    # Default for text-based files
+    return content.decode("utf-8", errors="ignore")
+
+
+# -------------------------------------------------------------
+# Worker functions (top-level so they pickle into pool processes)
+# -------------------------------------------------------------
+
+def _pdf_page_range(source: Union[str, bytes], start: int, stop: int) -> str:
+    """Text of pages [start, stop) from a PDF given as a file path or bytes."""
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    try:
+        return "\n".join(doc[i].get_text("text") for i in range(start, stop))
+    finally:
+        doc.close()
+
+
+class ExtractionJob:
+    """
+    Handle for one submitted document: an ordered list of futures, one per
+    page range (or a single one for DOCX/text and small PDFs).
+    Consuming it (write_to / text) removes its spill file; a job that is dropped
+    unconsumed should be closed (or used as a context manager).
+    """
+    def __init__(self, futures: List[Future], spill_path: Optional[str] = None):
+        self.futures = futures
+        self._spill_path = spill_path
+
+    @property
+    def closed(self) -> bool:
+        return self._spill_path is None
+
+    def close(self):
+        """Cancel page ranges not started yet and remove the spill file once none is reading it."""
+        if self._spill_path is None:
+            return
+        for fut in self.futures:
+            fut.cancel()
+        wait(self.futures)
+        try:
+            os.unlink(self._spill_path)
+        except FileNotFoundError:
+            pass
+        self._spill_path = None
+
+    def __enter__(self) -> "ExtractionJob":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _pieces(self):
+        try:
+            for fut in self.futures:
+                yield fut.result()
+        finally:
+            self.close()
+
+    def write_to(self, out_path: Path) -> int:
+        """Stream page ranges to `out_path` as they finish (in order). Returns the char count."""
+        chars = 0
+        with out_path.open("w", encoding="utf-8") as f:
+            for i, piece in enumerate(self._pieces()):
+                if i:
+                    f.write("\n")
+                    chars += 1
+                f.write(piece)
+                chars += len(piece)
+        return chars
+
+    def text(self) -> str:
+        return "\n".join(self._pieces())
+
+
+class ExtractionEngine:
+    """
+    Process-pool text extraction.
+
+    Documents are extracted in parallel, and PDFs longer than `pages_per_task`
+    are split into page ranges handled by several workers. Large PDFs are
+    spilled to a temp file once, so workers open it by path instead of each
+    receiving a pickled copy of the bytes.
+
+    Usage:
+        with ExtractionEngine() as engine:
+            job = engine.submit("rules.pdf", content)
+            chars = job.write_to(Path("out.txt"))
+    """
+    def __init__(self, max_workers: int = EXTRACT_WORKERS, pages_per_task: int = PAGES_PER_TASK):
+        self.max_workers = max(1, int(max_workers))
+        self.pages_per_task = max(1, int(pages_per_task))
+        # spawn: the ingest scripts already run download threads, which fork() does not mix well with
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+        self._spilled: List[ExtractionJob] = []  # jobs owning a spill file, until closed
+
+    @property
+    def window(self) -> int:
+        """How many documents callers should keep in flight to saturate the pool."""
+        return 2 * self.max_workers
+
+    def submit(self, file_path: str, content: bytes) -> ExtractionJob:
+        if Path(file_path).suffix.lower() != ".pdf":
+            return ExtractionJob([self._pool.submit(extract_text_from_bytes, file_path, content)])
+
+        with fitz.open(stream=content, filetype="pdf") as doc:
+            n_pages = doc.page_count
+        if n_pages <= self.pages_per_task:
+            return ExtractionJob([self._pool.submit(_pdf_page_range, content, 0, n_pages)])
+
+        self._spilled = [j for j in self._spilled if not j.closed]
+        fd, spill_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        futures = [
+            self._pool.submit(_pdf_page_range, spill_path, start, min(start + self.pages_per_task, n_pages))
+            for start in range(0, n_pages, self.pages_per_task)
+        ]
+        job = ExtractionJob(futures, spill_path)
+        self._spilled.append(job)
+        return job
+
+    def extract_to_file(self, file_path: str, content: bytes, out_path: Path) -> int:
+        return self.submit(file_path, content).write_to(out_path)
+
+    def close(self):
+        for job in self._spilled:
+            job.close()  # unconsumed jobs: drop their pending ranges and spill files
+        self._spilled = []
+        self._pool.shutdown(wait=True)
+
+    def __enter__(self) -> "ExtractionEngine":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,75 @@
+"""
+Streaming JSONL manifest writer.
+- Rows are appended to <manifest>.partial as they are produced (flat memory)
+- Flushed + fsync'd every `flush_every` rows so a crash loses at most one batch
+- finalize() atomically renames the partial file over the real manifest
+- Re-opening an interrupted partial file resumes after its last complete row
+"""
+from __future__ import annotations
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.utils.jsonl import recover_jsonl
+
+MANIFEST_FLUSH_EVERY: int = int(os.environ.get("INGEST_FLUSH_EVERY", "50"))
+
+
+class JsonlManifestWriter:
+    """
+    Usage:
+        with JsonlManifestWriter(manifest_path) as writer:
+            if writer.last_row: ...  # resume after this row
+            writer.write(row)
+    Leaving the block normally finalizes; an exception keeps the partial file for resume.
+    """
+    def __init__(self, path: Path, flush_every: int = MANIFEST_FLUSH_EVERY, resume: bool = True):
+        self.path = path
+        self.partial_path = path.with_name(path.name + ".partial")
+        self.flush_every = max(1, int(flush_every))
+        self.count = 0
+        self.last_row: Optional[Dict[str, Any]] = None
+
+        if resume and self.partial_path.exists():
+            self.count, self.last_row = recover_jsonl(self.partial_path)
+            self._f = self.partial_path.open("a", encoding="utf-8")
+        else:
+            self._f = self.partial_path.open("w", encoding="utf-8")
+        self._unflushed = 0
+
+    @property
+    def resumed(self) -> bool:
+        return self.last_row is not None
+
+    def write(self, row: Dict[str, Any]):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.count += 1
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._unflushed = 0
+
+    def close(self):
+        """Close without publishing; the partial file stays for a later resume."""
+        if not self._f.closed:
+            self.flush()
+            self._f.close()
+
+    def finalize(self) -> Path:
+        self.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def __enter__(self) -> "JsonlManifestWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finalize()
+        else:
+            self.close()
@@ -0,0 +1,83 @@
+"""
+Persistent ingestion state for incremental re-runs.
+- One JSON file per namespace: link -> {sha1, etag, last_modified}
+- Supplies conditional request headers (If-None-Match / If-Modified-Since)
+- Saved atomically so a crash never leaves a half-written state file
+"""
+from __future__ import annotations
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+STATE_VERSION = 1
+
+
+def atomic_write_text(path: Path, text: str):
+    """Write to a sibling temp file, then rename over `path`."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def replace_dir(tmp_dir: Path, final_dir: Path):
+    """Swap a freshly written directory into place (e.g. an Arrow dataset)."""
+    old_dir = final_dir.with_name(final_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    if final_dir.exists():
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+
+
+class IngestState:
+    """
+    Tracks what each storage object looked like the last time it was ingested.
+
+    Used to send conditional GETs (a 304 costs one round trip and no bytes) and to
+    skip extraction when a re-downloaded file hashes to the same sha1.
+    """
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if data.get("version") == STATE_VERSION:
+                self.entries = data.get("entries", {})
+
+    def get(self, link: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(link)
+
+    def conditional_headers(self, link: str) -> Optional[Dict[str, str]]:
+        entry = self.entries.get(link)
+        if not entry:
+            return None
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers or None
+
+    def update(self, link: str, sha1: str, response_headers: Mapping[str, str]):
+        """Record the hash and validators of a successful (200) download."""
+        self.entries[link] = {
+            "sha1": sha1,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+        }
+
+    def prune(self, live_links: Iterable[str]) -> List[str]:
+        """Forget links that are no longer listed in the metadata table."""
+        live = set(live_links)
+        removed = [link for link in self.entries if link not in live]
+        for link in removed:
+            del self.entries[link]
+        return removed
+
+    def save(self):
+        payload = {"version": STATE_VERSION, "entries": self.entries}
+        atomic_write_text(self.path, json.dumps(payload, indent=2, ensure_ascii=False))
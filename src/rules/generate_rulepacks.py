@@ -1,36 +1,180 @@
 """
 Generates YAML rule-packs dynamically from extracted regulator text files.
 Uses lightweight LLM summarization to identify sections, clauses, and domains.
+- Summaries are cached by (model, sha1 of the article text) in an append-only JSONL
+  under data/interim/summaries/, so unchanged articles are never summarized again
+- The cache doubles as the checkpoint: it is flushed + fsync'd every few batches,
+  and a crashed run resumes from what was already summarized
+- Texts are summarized in length-sorted batches, spread over worker processes
+  (each loads the summarizer once and gets its share of the CPU threads)
+
+Run:
+  python -m src.rules.generate_rulepacks --ns qcb [--workers 4] [--batch-size 8]
 """
-import json, yaml
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
+from typing import Dict, List, Tuple
 from transformers import pipeline
 from tqdm import tqdm
+from models.config.defaults import ROOT_DIR
+from models.retriever.rulepack import write_rulepack
+from src.utils.jsonl import recover_jsonl
 
-def generate_rulepack(ns: str, model_name: str = "distilbart-cnn-12-6"):
-    base_dir = Path("data/interim/reg_corpus") / ns
-    out_path = Path("config/regulators") / f"{ns}.yaml"
-    out_path.parent.mkdir(parents=True, exist_ok=True)
+DEFAULT_MODEL = "distilbart-cnn-12-6"
+SUMMARY_BATCH_SIZE = int(os.environ.get("RULEPACK_BATCH_SIZE", "8"))
+SUMMARY_WORKERS = int(os.environ.get("RULEPACK_WORKERS", str(max(1, (os.cpu_count() or 1) // 4))))
+CHECKPOINT_EVERY = 4  # batches between fsyncs of the summary cache
+MAX_ARTICLE_CHARS = 4000
+CORPUS_DIR = ROOT_DIR / "data" / "interim" / "reg_corpus"
+SUMMARY_CACHE_DIR = ROOT_DIR / "data" / "interim" / "summaries"
 
-    # Load summarizer model
-    summarizer = pipeline("summarization", model=model_name, truncation=True)
+class SummaryCache:
+    """sha1 → summary for one model; append-only JSONL, torn last line dropped on open."""
+    def __init__(self, model_name: str, root: Path = SUMMARY_CACHE_DIR):
+        root.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        self.path = root / (model_name.replace("/", "__") + ".jsonl")
+        self.entries: Dict[str, str] = {}
+        if self.path.exists():
+            recover_jsonl(self.path)
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    row = json.loads(line)
+                    self.entries[row["sha1"]] = row["summary"]
+        self._f = self.path.open("a", encoding="utf-8")
 
-    articles = []
-    for f in tqdm(sorted(base_dir.glob("*.txt"))):
-        text = f.read_text(encoding="utf-8", errors="ignore")[:4000]
+    def __contains__(self, sha1: str) -> bool:
+        return sha1 in self.entries
+
+    def __getitem__(self, sha1: str) -> str:
+        return self.entries[sha1]
+
+    def add(self, sha1: str, summary: str):
+        self.entries[sha1] = summary
+        self._f.write(json.dumps({"model": self.model_name, "sha1": sha1, "summary": summary}, ensure_ascii=False) + "\n")
+
+    def checkpoint(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        if not self._f.closed:
+            self.checkpoint()
+            self._f.close()
+
+# ---- worker side (one summarizer per process) ----
+_summarizer = None
+
+def _init_worker(model_name: str, threads: int):
+    global _summarizer
+    import torch
+    torch.set_num_threads(max(1, threads))
+    _summarizer = pipeline("summarization", model=model_name, truncation=True)
+
+def _summarize_batch(batch: List[Tuple[str, str]], batch_size: int) -> List[Tuple[str, str, bool]]:
+    """(sha1, summary, ok) per item; a failing batch is retried item by item."""
+    texts = [t for _, t in batch]
+    try:
+        outs = _summarizer(texts, max_length=120, min_length=40, batch_size=batch_size)
+        return [(sha1, o["summary_text"], True) for (sha1, _), o in zip(batch, outs)]
+    except Exception:
+        pass
+    results = []
+    for sha1, text in batch:
         try:
-            summary = summarizer(text, max_length=120, min_length=40)[0]["summary_text"]
+            results.append((sha1, _summarizer(text, max_length=120, min_length=40)[0]["summary_text"], True))
         except Exception:
-            summary = text[:300]
+            results.append((sha1, text[:300], False))  # fallback is not cached: retried next run
+    return results
+
+def _batches(todo: Dict[str, str], batch_size: int) -> List[List[Tuple[str, str]]]:
+    # length-sorted so each batch pads to similar lengths
+    items = sorted(todo.items(), key=lambda kv: len(kv[1]))
+    return [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+
+def summarize_all(texts: Dict[str, str], cache: SummaryCache, model_name: str,
+                  batch_size: int = SUMMARY_BATCH_SIZE, workers: int = SUMMARY_WORKERS) -> Dict[str, str]:
+    """Summaries for sha1 → text, computing only those missing from the cache."""
+    todo = {sha1: t for sha1, t in texts.items() if sha1 not in cache}
+    out = {sha1: cache[sha1] for sha1 in texts if sha1 in cache}
+    print(f"[rulepack] {len(out)} cached summaries, {len(todo)} to compute ({workers} worker(s))")
+    if not todo:
+        return out
+
+    batches = _batches(todo, batch_size)
+    threads = max(1, (os.cpu_count() or 1) // max(1, workers))
+    done = 0
+
+    def _collect(results):
+        nonlocal done
+        for sha1, summary, ok in results:
+            out[sha1] = summary
+            if ok:
+                cache.add(sha1, summary)
+        done += 1
+        if done % CHECKPOINT_EVERY == 0:
+            cache.checkpoint()
+
+    with tqdm(total=len(todo), desc="summarize") as bar:
+        if workers <= 1:
+            _init_worker(model_name, threads)
+            for batch in batches:
+                _collect(_summarize_batch(batch, batch_size))
+                bar.update(len(batch))
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                     initializer=_init_worker, initargs=(model_name, threads)) as ex:
+                futures = {ex.submit(_summarize_batch, batch, batch_size): len(batch) for batch in batches}
+                for fut in as_completed(futures):
+                    _collect(fut.result())
+                    bar.update(futures[fut])
+    cache.checkpoint()
+    return out
+
+def generate_rulepack(ns: str, model_name: str = DEFAULT_MODEL, batch_size: int = SUMMARY_BATCH_SIZE,
+                      workers: int = SUMMARY_WORKERS):
+    base_dir = CORPUS_DIR / ns
+    files = sorted(base_dir.glob("*.txt"))
+    texts = [f.read_text(encoding="utf-8", errors="ignore")[:MAX_ARTICLE_CHARS] for f in files]
+    keys = [hashlib.sha1(t.encode("utf-8")).hexdigest() for t in texts]
+
+    cache = SummaryCache(model_name)
+    try:
+        summaries = summarize_all(dict(zip(keys, texts)), cache, model_name, batch_size, workers)
+    finally:
+        cache.close()
+
+    articles = []
+    for f, text, sha1 in zip(files, texts, keys):
         articles.append({
             "article_id": f.stem,
             "title": f"Extracted Section {len(articles)+1}",
             "domain": "general",
             "text": text,
-            "summary": summary,
+            "summary": summaries[sha1],
             "confidence": 0.9
         })
 
     rulepack = {"regulator": ns, "articles": articles}
-    out_path.write_text(yaml.dump(rulepack, allow_unicode=True))
+    # C emitter when available; also compiles the binary cache index builds/serving read from
+    out_path = write_rulepack(ns, rulepack)
     print(f"[rulepack] wrote {out_path}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--ns", action="append", required=True, help="regulator namespace (repeatable)")
+    ap.add_argument("--model", default=DEFAULT_MODEL)
+    ap.add_argument("--batch-size", type=int, default=SUMMARY_BATCH_SIZE)
+    ap.add_argument("--workers", type=int, default=SUMMARY_WORKERS)
+    args = ap.parse_args()
+    for ns in args.ns:
+        generate_rulepack(ns.lower(), args.model, args.batch_size, args.workers)
+
+if __name__ == "__main__":
+    main()
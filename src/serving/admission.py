@@ -0,0 +1,97 @@
+"""
+Admission control for the serving layer.
+- InFlightLimiter: caps requests being extracted or analyzed at once; past the
+  cap new requests are refused right away (429 + Retry-After) instead of queueing
+  without bound
+- run_cancellable: awaits a request's work with a deadline and stops waiting as
+  soon as the client disconnects. Queued inference items of a cancelled request
+  are dropped by the batcher; a call already running in a worker thread finishes
+  but its result is discarded.
+- BodySizeLimit: ASGI middleware refusing request bodies past a byte budget (413),
+  up front from Content-Length or while the body streams in (chunked uploads)
+"""
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Sequence
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from src.serving.batching import Overloaded
+
+DISCONNECT_POLL_S = 0.25
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready."""
+
+
+class InFlightLimiter:
+    """Non-blocking counter (event-loop thread only, so no lock is needed)."""
+    def __init__(self, max_in_flight: int, retry_after: Callable[[], int] = lambda: 1):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.retry_after = retry_after
+        self.in_flight = 0
+
+    @contextmanager
+    def slot(self):
+        if self.in_flight >= self.max_in_flight:
+            raise Overloaded("too many requests in flight", 429, self.retry_after())
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+
+async def run_cancellable(request: Request, work: Awaitable[Any], timeout: float,
+                          poll: float = DISCONNECT_POLL_S) -> Any:
+    """
+    Result of `work`, or asyncio.TimeoutError past `timeout` seconds, or
+    ClientDisconnected if the client hangs up first. The work is cancelled in both cases.
+    """
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(work)
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait({task}, timeout=min(poll, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+class BodySizeLimit:
+    """Caps the request body on `paths`; the form parser never buffers past `max_bytes`."""
+    def __init__(self, app, max_bytes: int, paths: Sequence[str] = ("/analyze",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": "Request body too large"}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # HTTPException passes through FastAPI's body parsing as-is → 413 response
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -1,17 +1,67 @@
-from fastapi import FastAPI, UploadFile, Form, HTTPException
+import time
+APP_T0 = time.perf_counter()  # startup report: time spent importing this module
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from models.inference.predict import InferencePipeline
+from fastapi.responses import JSONResponse
+from src.serving.batching import MicroBatcher, Overloaded
+from src.serving.admission import InFlightLimiter, ClientDisconnected, BodySizeLimit, run_cancellable
+from src.serving.uploads import UploadError, UploadExtractor, spool_upload
+from src.serving.startup import ModelLoader
+
+# Micro-batching: how long a request may wait for company, and the largest batch
+BATCH_MAX_SIZE = int(os.environ.get("AIX_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("AIX_BATCH_MAX_WAIT_MS", "10"))
+# Long-document classification (strided windows instead of truncating at 512 tokens)
+LONG_DOC = os.environ.get("AIX_LONG_DOC", "1") == "1"
+# Namespace preloaded at startup, and whether to warm the models before reporting ready
+DEFAULT_NS = os.environ.get("AIX_DEFAULT_NS", "qcb")
+WARMUP = os.environ.get("AIX_WARMUP", "1") == "1"
+# Backpressure: requests admitted at once (extraction + inference), texts waiting for a batch
+MAX_IN_FLIGHT = int(os.environ.get("AIX_MAX_IN_FLIGHT", "64"))
+MAX_QUEUED = int(os.environ.get("AIX_MAX_QUEUED", "32"))
+# Per-request deadline (seconds) → 504 past it
+REQUEST_TIMEOUT_S = float(os.environ.get("AIX_REQUEST_TIMEOUT_S", "60"))
+# Uploads: size limit, then text extraction in a process pool, capped in pages/chars/time
+MAX_UPLOAD_MB = int(os.environ.get("AIX_MAX_UPLOAD_MB", "50"))
+EXTRACT_WORKERS = int(os.environ.get("AIX_EXTRACT_WORKERS", "2"))
+EXTRACT_MAX_PAGES = int(os.environ.get("AIX_EXTRACT_MAX_PAGES", "200"))
+EXTRACT_MAX_CHARS = int(os.environ.get("AIX_EXTRACT_MAX_CHARS", "2000000"))
+EXTRACT_TIMEOUT_S = float(os.environ.get("AIX_EXTRACT_TIMEOUT_S", "30"))
+UPLOAD_SPOOL_DIR = os.environ.get("AIX_UPLOAD_SPOOL_DIR")  # None → system temp dir
+FORM_OVERHEAD_BYTES = 64 * 1024  # multipart boundaries + other form fields
+NOT_READY_RETRY_S = 5
 
-# 1. Initialize the pipeline ONCE outside the function
-try:
-    # Assuming 'qcb' is a safe default for initialization
-    # If the model is large, this will be the bottleneck for startup time
-    model_pipeline = InferencePipeline(default_regulator_ns="qcb") 
-except Exception as e:
-    # Handle failure to load model at startup
-    raise RuntimeError(f"Failed to initialize InferencePipeline: {e}")
+# 1. The pipeline is built ONCE, in the background after the server is up (see startup.py);
+#    a load failure is reported on /readyz instead of killing the process
+loader = ModelLoader(regulator_ns=DEFAULT_NS, long_doc=LONG_DOC, warmup=WARMUP, t0=APP_T0)
 
-app = FastAPI(title="AIX Hackathon Fintech Regulatory AI")
+def _run_batch(regulator_ns: str, texts):
+    # Batches are grouped per namespace; the namespace travels with the call, no shared state is flipped
+    return loader.pipeline.run_batch(texts, regulator_ns=regulator_ns)
+
+batcher = MicroBatcher(_run_batch, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                       max_pending=MAX_QUEUED)
+limiter = InFlightLimiter(MAX_IN_FLIGHT, retry_after=batcher.retry_after)
+extractor = UploadExtractor(EXTRACT_WORKERS, EXTRACT_MAX_PAGES, EXTRACT_MAX_CHARS, EXTRACT_TIMEOUT_S)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup: the batcher loop, model loading in the background (see startup.py), and the
+    # extraction forkserver in a thread (the first extraction would boot it on the event loop)
+    await batcher.start()
+    loader.start()
+    asyncio.ensure_future(asyncio.to_thread(extractor.start))
+    try:
+        yield
+    finally:
+        await batcher.stop()
+        extractor.close()
+
+app = FastAPI(title="AIX Hackathon Fintech Regulatory AI", lifespan=lifespan)
 
 # ... CORS configuration 
 origins = [
@@ -28,24 +78,70 @@ app.add_middleware(
     allow_methods=["*"],         # Allow all methods (POST, GET, etc.)
     allow_headers=["*"],         # Allow all headers
 )
+# Oversized bodies are refused before/while streaming, not after the form parser has spooled them
+app.add_middleware(BodySizeLimit, max_bytes=MAX_UPLOAD_MB * (1 << 20) + FORM_OVERHEAD_BYTES)
+
+async def _extract(file: UploadFile):
+    """Spool the upload to disk, sniff its type, extract text in the worker pool."""
+    path, kind, _ = await spool_upload(file, MAX_UPLOAD_MB * (1 << 20), UPLOAD_SPOOL_DIR)
+    try:
+        content, info = await extractor.extract(path, kind)
+    finally:
+        os.unlink(path)
+    if not content.strip():
+        raise UploadError("No extractable text (scanned or image-only document?)", 422)
+    return content, info
+
+async def _analyze(regulator_ns: str, file: UploadFile, text: str):
+    content, info = (text, None) if text else await _extract(file)
+    # 2. Queue the request; the batcher runs it together with concurrent ones
+    return await batcher.submit(regulator_ns, content), info
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process and its event loop respond (models may still be loading)."""
+    return {"status": "ok", "uptime_s": round(time.perf_counter() - APP_T0, 1)}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: models loaded and warmed; 503 with the current stage (or the load error) otherwise."""
+    status = loader.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status, headers={"Retry-After": str(NOT_READY_RETRY_S)})
+    return status
 
 @app.post("/analyze")
 async def analyze(
+    request: Request,
     regulator_ns: str = Form("qcb"),
     file: UploadFile = None,
     text: str = Form(None)
 ):
-    # Ensure the pipeline instance uses the correct regulator namespace 
-    # (assuming InferencePipeline supports updating this mid-run)
-    model_pipeline.set_regulator(regulator_ns) # *Requires a new method in your InferencePipeline class*
-    
-    # ... rest of your logic ...
-    
-    # 2. Call the pre-loaded instance
+    if not text and file is None:
+        raise HTTPException(status_code=400, detail="Provide either 'text' or 'file'.")
+    if not loader.ready.is_set():
+        raise HTTPException(status_code=503, detail=f"Models not ready ({loader.stage})",
+                            headers={"Retry-After": str(NOT_READY_RETRY_S)})
+
     try:
-        result = model_pipeline.run(content)
+        with limiter.slot():
+            result, extraction = await run_cancellable(request, _analyze(regulator_ns, file, text),
+                                                       REQUEST_TIMEOUT_S)
+    except UploadError as e:
+        # 413 too large, 415 unsupported type, 422 no text, 504 extraction timeout
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Overloaded as e:
+        # saturated: 429 (in-flight cap) / 503 (inference queue full), both with a Retry-After hint
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Analysis exceeded {REQUEST_TIMEOUT_S:g}s")
+    except ClientDisconnected:
+        return Response(status_code=499)  # nobody is listening; work already cancelled
     except Exception as e:
         # 3. Add robust error handling
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
-        
-    return {"regulator": regulator_ns, "result": result}
\ No newline at end of file
+
+    response = {"regulator": regulator_ns, "result": result}
+    if extraction is not None:
+        response["extraction"] = extraction  # pages read, truncated, seconds
+    return response
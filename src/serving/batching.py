@@ -0,0 +1,122 @@
+"""
+Dynamic micro-batching for the serving layer.
+Requests arriving within `max_wait_ms` of each other (up to `max_batch_size`)
+are run as one batch through a blocking batch function on a worker thread,
+so 50 concurrent uploads cost a few padded forward passes instead of 50.
+The queue is bounded (`max_pending`): past it, submit() raises Overloaded with a
+Retry-After hint derived from the recent batch latency.
+"""
+import asyncio
+import math
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class Overloaded(Exception):
+    """Request refused for lack of capacity; maps to an HTTP status + Retry-After."""
+    def __init__(self, detail: str, status_code: int = 503, retry_after: int = 1):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class MicroBatcher:
+    """
+    Usage:
+        batcher = MicroBatcher(run_for_namespace)   # (ns, texts) -> results
+        await batcher.start()
+        result = await batcher.submit("qcb", text)
+
+    `batch_fn(key, items)` must return one result per item, in order. Requests are
+    only batched with others that share the same key (e.g. regulator namespace).
+    """
+    def __init__(
+        self,
+        batch_fn: Callable[[Hashable, List[Any]], List[Any]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        executor: Optional[Executor] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_pending = max_pending  # None → unbounded
+        self.pending = 0                # submitted, not yet resolved
+        self.batch_seconds = 0.0        # moving average of one batch call
+        # one inference thread: batches run back to back, torch uses intra-op threads
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch")
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (at least 1)."""
+        batches = math.ceil(self.pending / self.max_batch_size)
+        return max(1, math.ceil(batches * self.batch_seconds))
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Result for `item`; cancelling the caller drops the item if its batch has not started."""
+        if self.max_pending is not None and self.pending >= self.max_pending:
+            raise Overloaded("inference queue full", 503, self.retry_after())
+        fut = asyncio.get_running_loop().create_future()
+        self.pending += 1
+        try:
+            await self._queue.put((key, item, fut))
+            return await fut
+        finally:
+            self.pending -= 1
+
+    async def _collect(self) -> List[Tuple[Hashable, Any, asyncio.Future]]:
+        """Block for the first request, then gather more until the batch is full or the wait budget is spent."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            groups: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+            for key, item, fut in batch:
+                if not fut.cancelled():  # caller gave up (timeout / disconnect)
+                    groups.setdefault(key, []).append((item, fut))
+
+            for key, entries in groups.items():
+                items = [item for item, _ in entries]
+                started = time.monotonic()
+                try:
+                    results = await loop.run_in_executor(self.executor, self.batch_fn, key, items)
+                except Exception as e:
+                    for _, fut in entries:
+                        if not fut.done():
+                            fut.set_exception(e)
+                    continue
+                finally:
+                    elapsed = time.monotonic() - started
+                    self.batch_seconds = elapsed if not self.batch_seconds else 0.8 * self.batch_seconds + 0.2 * elapsed
+                for (_, fut), result in zip(entries, results):
+                    if not fut.done():
+                        fut.set_result(result)
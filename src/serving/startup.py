@@ -0,0 +1,90 @@
+"""
+Staged model startup for the serving layer.
+- The app imports nothing heavy: torch / transformers / FAISS are imported by a
+  background thread once the server is already accepting connections
+- Stages: import → load (classifiers, encoder, default regulator index) → warmup
+  (one synthetic batch through classification, search and scoring, so the first
+  real request does not pay for lazy init, allocator growth or page faults)
+- /healthz answers as soon as the process is up; /readyz only once warmup is done,
+  and reports the failing stage + error if loading failed
+- Each startup appends its stage timings to reports/startup_timings.jsonl
+"""
+import json
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+from models.config.defaults import REPORTS_DIR
+
+STARTUP_REPORT = REPORTS_DIR / "startup_timings.jsonl"
+WARMUP_TEXTS = [
+    "Business plan: the company will hold customer funds, perform KYC on onboarding "
+    "and keep paid-up capital above the regulatory minimum.",
+    # long enough for several classifier windows and query chunks
+    " ".join(["The policy sets governance, data residency and anti-money laundering controls."] * 120),
+]
+
+
+def _import_pipeline():
+    from models.inference.predict import InferencePipeline
+    return InferencePipeline
+
+
+class ModelLoader:
+    """Builds the InferencePipeline on a daemon thread; `pipeline` is set once `ready` is."""
+    def __init__(self, regulator_ns: str, long_doc: bool = True, warmup: bool = True,
+                 report_path=STARTUP_REPORT, t0: Optional[float] = None):
+        self.regulator_ns = regulator_ns
+        self.long_doc = long_doc
+        self.warmup = warmup
+        self.report_path = report_path
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.pipeline = None
+        self.stage = "starting"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {"app_import_s": round(time.perf_counter() - self.t0, 3)}
+        self.ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def _timed(self, stage: str, fn: Callable[[], Any]) -> Any:
+        self.stage = stage
+        start = time.perf_counter()
+        out = fn()
+        self.timings[f"{stage}_s"] = round(time.perf_counter() - start, 3)
+        return out
+
+    def _run(self):
+        try:
+            pipeline_cls = self._timed("import", _import_pipeline)
+            pipeline = self._timed("load", lambda: pipeline_cls(regulator_ns=self.regulator_ns, long_doc=self.long_doc))
+            if self.warmup:
+                self._timed("warmup", lambda: pipeline.run_batch(WARMUP_TEXTS))
+            self.pipeline = pipeline
+            self.stage = "ready"
+            self.ready.set()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            print(f"[startup] failed during {self.stage}: {self.error}\n{traceback.format_exc()}")
+            self.stage = f"failed:{self.stage}"
+        self.timings["total_s"] = round(time.perf_counter() - self.t0, 3)
+        print(f"[startup] {self.stage} {self.timings}")
+        self._write_report()
+
+    def _write_report(self):
+        row = {"time": datetime.now(timezone.utc).isoformat(), "pid": os.getpid(),
+               "status": self.stage, "error": self.error, **self.timings}
+        try:
+            self.report_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.report_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+        except OSError as e:
+            print(f"[startup] could not write {self.report_path}: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {"ready": self.ready.is_set(), "stage": self.stage, "error": self.error, "timings": dict(self.timings)}
@@ -0,0 +1,276 @@
+"""
+Upload handling for /analyze.
+- spool_upload: copies the upload to a named temp file in 1 MiB chunks (never the
+  whole file in memory), enforcing the size limit as it goes (413), and detects
+  the type from magic bytes rather than the file name (415 when unsupported)
+- UploadExtractor: text extraction in a child process per job (at most
+  max_workers at once), by file path
+    page cap + char cap      → a 200 MB scanned PDF reads at most max_pages pages
+    cooperative deadline     → the child stops early and returns what it has
+    hard timeout / cancel    → 504; only that job's process is killed, other
+                               extractions are untouched
+    one process per job      → nothing leaks from one document to the next
+  Children come from a forkserver (spawn where unavailable) with the parsers
+  preloaded, so a job starts in milliseconds without forking the threaded server.
+  Time spent waiting for a free slot counts against the job's timeout. The event
+  loop only waits for the pipe to become readable; the result is read and decoded
+  in a thread, in 1 Mi-char pieces, so a large document does not stall other requests.
+Worker functions are top-level and the heavy parsers (PyMuPDF, python-docx) are
+imported inside them, so the server process never loads them.
+"""
+import asyncio
+import codecs
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from typing import Any, Dict, Optional, Tuple
+
+UPLOAD_CHUNK = 1 << 20
+HEAD_BYTES = 4096
+DOCX_MAX_XML_BYTES = 256 << 20  # uncompressed word/document.xml (zip bombs)
+COOPERATIVE_FRACTION = 0.8      # children wind down at this share of the remaining timeout
+RESULT_PIECE_CHARS = 1 << 20    # text goes back to the server in pieces of this many chars
+FORKSERVER_PRELOAD = ["src.serving.uploads", "fitz", "docx"]
+
+
+class UploadError(Exception):
+    """Upload refused or extraction failed; maps to an HTTP status."""
+    def __init__(self, detail: str, status_code: int):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+# -------------------------------------------------------------
+# Spooling + type detection
+# -------------------------------------------------------------
+
+def sniff_type(path: str, head: bytes) -> str:
+    """"pdf" | "docx" | "text" from the leading bytes (zip container checked for a Word part)."""
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(path) as z:
+                info = {i.filename: i for i in z.infolist()}
+        except zipfile.BadZipFile:
+            raise UploadError("Corrupt zip/docx upload", 415)
+        if "word/document.xml" not in info:
+            raise UploadError("Zip archive is not a .docx document", 415)
+        if info["word/document.xml"].file_size > DOCX_MAX_XML_BYTES:
+            raise UploadError("Document body too large once decompressed", 413)
+        return "docx"
+    if b"\x00" not in head:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+            return "text"
+        except UnicodeDecodeError:
+            pass
+    raise UploadError("Unsupported file type (expected PDF, DOCX or UTF-8 text)", 415)
+
+
+async def spool_upload(file, max_bytes: int, spool_dir: Optional[str] = None) -> Tuple[str, str, int]:
+    """Stream an UploadFile to disk → (path, kind, size). The caller removes the file."""
+    fd, path = tempfile.mkstemp(prefix="aix-upload-", dir=spool_dir)
+    size, head = 0, b""
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                data = await file.read(UPLOAD_CHUNK)
+                if not data:
+                    break
+                size += len(data)
+                if size > max_bytes:
+                    raise UploadError(f"Upload exceeds {max_bytes // (1 << 20)} MB", 413)
+                if len(head) < HEAD_BYTES:
+                    head += data[:HEAD_BYTES - len(head)]
+                await asyncio.to_thread(out.write, data)
+        if not size:
+            raise UploadError("Empty upload", 400)
+        kind = await asyncio.to_thread(sniff_type, path, head)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, kind, size
+
+
+# -------------------------------------------------------------
+# Worker side
+# -------------------------------------------------------------
+
+def _extract_file(path: str, kind: str, max_pages: int, max_chars: int,
+                  budget_s: float) -> Tuple[str, Dict[str, Any]]:
+    """Text of the spooled file, capped by pages / chars / time; info says what was skipped."""
+    start = time.monotonic()
+    info: Dict[str, Any] = {"kind": kind, "truncated": False}
+    parts, chars = [], 0
+
+    def _full() -> bool:
+        return chars >= max_chars or time.monotonic() - start > budget_s
+
+    if kind == "pdf":
+        import fitz  # PyMuPDF
+        with fitz.open(path) as doc:
+            info["pages"] = doc.page_count
+            for i in range(min(doc.page_count, max_pages)):
+                if _full():
+                    break
+                text = doc[i].get_text("text")
+                parts.append(text)
+                chars += len(text) + 1
+            info["pages_read"] = len(parts)
+            info["truncated"] = len(parts) < doc.page_count
+    elif kind == "docx":
+        from docx import Document
+        paragraphs = Document(path).paragraphs
+        for p in paragraphs:
+            if _full():
+                break
+            parts.append(p.text)
+            chars += len(p.text) + 1
+        info["truncated"] = len(parts) < len(paragraphs)
+    else:
+        with open(path, "rb") as f:
+            raw = f.read(4 * max_chars + 4)  # utf-8: at most 4 bytes per char
+        parts.append(raw.decode("utf-8", errors="ignore"))
+        info["truncated"] = len(raw) > 4 * max_chars or len(parts[0]) > max_chars
+    text = "\n".join(parts)
+    info["truncated"] = info["truncated"] or len(text) > max_chars
+    info["seconds"] = round(time.monotonic() - start, 3)
+    return text[:max_chars], info
+
+
+def _extract_child(conn, path: str, kind: str, max_pages: int, max_chars: int, budget_s: float):
+    """
+    Child process entry point: ("ok", info, n_pieces) then the text as n_pieces UTF-8
+    byte strings, or ("error", message). Pieces keep each decode in the parent short.
+    """
+    try:
+        text, info = _extract_file(path, kind, max_pages, max_chars, budget_s)
+        pieces = range(0, len(text), RESULT_PIECE_CHARS)
+        conn.send(("ok", info, len(pieces)))
+        for i in pieces:
+            conn.send_bytes(text[i:i + RESULT_PIECE_CHARS].encode("utf-8"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}", 0))
+    finally:
+        conn.close()
+
+
+def _noop():
+    pass
+
+
+def _receive(conn) -> Tuple[str, Any]:
+    """Parent side of _extract_child (runs in a worker thread): (status, (text, info) | message)."""
+    status, payload, n_pieces = conn.recv()
+    if status != "ok":
+        return status, payload
+    return status, ("".join(conn.recv_bytes().decode("utf-8") for _ in range(n_pieces)), payload)
+
+
+# -------------------------------------------------------------
+# Parent side
+# -------------------------------------------------------------
+
+def _mp_context():
+    # never plain fork: the server process runs threads (batcher, model loader)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(FORKSERVER_PRELOAD)
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class UploadExtractor:
+    """
+    Usage (event loop):
+        extractor = UploadExtractor(max_workers=2, max_pages=200, max_chars=2_000_000, timeout_s=30)
+        text, info = await extractor.extract(path, kind)
+    """
+    def __init__(self, max_workers: int, max_pages: int, max_chars: int, timeout_s: float):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pages = max(1, int(max_pages))
+        self.max_chars = max(1, int(max_chars))
+        self.timeout_s = timeout_s
+        self.killed = 0
+        self._ctx = _mp_context()
+        self._slots: Optional[asyncio.Semaphore] = None  # created on the serving loop
+        self._procs = set()
+
+    def start(self):
+        """
+        Boot the forkserver (it imports the parsers) with one no-op child; blocking,
+        so call it from a thread at startup instead of paying it on the event loop.
+        """
+        proc = self._ctx.Process(target=_noop, daemon=True)
+        proc.start()
+        proc.join()
+
+    async def extract(self, path: str, kind: str) -> Tuple[str, Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_s
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout_s)
+        except asyncio.TimeoutError:
+            raise UploadError(f"Text extraction exceeded {self.timeout_s:g}s (no free worker)", 504)
+        try:
+            return await self._run(loop, path, kind, deadline)
+        finally:
+            self._slots.release()
+
+    async def _run(self, loop, path: str, kind: str, deadline: float) -> Tuple[str, Dict[str, Any]]:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            raise UploadError(f"Text extraction exceeded {self.timeout_s:g}s (no free worker)", 504)
+        recv, send = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(target=_extract_child, daemon=True,
+                                 args=(send, path, kind, self.max_pages, self.max_chars,
+                                       remaining * COOPERATIVE_FRACTION))
+        readable = loop.create_future()
+        receiving = None
+        answered = False
+        try:
+            proc.start()
+            self._procs.add(proc)
+            send.close()  # EOF on recv if the child dies without answering
+            # wait on the event loop for the first byte (no thread is held while the child works) ...
+            loop.add_reader(recv.fileno(), lambda: readable.done() or readable.set_result(None))
+            try:
+                await asyncio.wait_for(readable, max(0.0, deadline - loop.time()))
+            finally:
+                loop.remove_reader(recv.fileno())
+            # ... then read the (possibly multi-MB) result in a thread, off the event loop
+            receiving = loop.run_in_executor(None, _receive, recv)
+            try:
+                status, payload = await asyncio.wait_for(asyncio.shield(receiving), max(0.0, deadline - loop.time()))
+                answered = True  # the child exits on its own right after sending
+            except EOFError:
+                raise UploadError(f"Text extraction failed (worker exited with {proc.exitcode})", 500)
+        except asyncio.TimeoutError:
+            raise UploadError(f"Text extraction exceeded {self.timeout_s:g}s", 504)
+        finally:
+            if not answered and proc.is_alive():  # timed out or the request was cancelled
+                proc.kill()
+                self.killed += 1
+                print(f"[extract] killed extraction process {proc.pid} ({self.killed} so far)")
+            if receiving is not None and not receiving.done():
+                # the kill closed the child's end: the reading thread sees EOF and returns
+                await asyncio.wait([receiving])
+            if receiving is not None and not receiving.cancelled():
+                receiving.exception()  # consumed here when the timeout path won
+            recv.close()
+            self._procs.discard(proc)
+            multiprocessing.active_children()  # reaps finished children without blocking
+        if status != "ok":
+            raise UploadError(f"Text extraction failed ({payload})", 500)
+        return payload
+
+    def close(self):
+        for proc in list(self._procs):
+            if proc.is_alive():
+                proc.kill()
@@ -0,0 +1 @@
+"""Shared helpers used by several pipeline stages (ingestion, rule generation)."""
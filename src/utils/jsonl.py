@@ -0,0 +1,26 @@
+"""
+Append-only JSONL helpers.
+- recover_jsonl: makes a file left behind by a crash mid-write readable again
+"""
+from __future__ import annotations
+import json
+from pathlib import Path
+
+
+def recover_jsonl(path: Path):
+    """
+    Count the complete rows in an interrupted JSONL file, return the last one,
+    and truncate a torn trailing line left by a crash mid-write.
+    """
+    count, last_line, good_end = 0, None, 0
+    with path.open("rb") as f:
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                count += 1
+                last_line = line
+            good_end = f.tell()
+    with path.open("r+b") as f:
+        f.truncate(good_end)
+    return count, (json.loads(last_line) if last_line else None)